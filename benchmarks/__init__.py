@@ -0,0 +1,6 @@
+"""
+Benchmarks for config_parser.
+
+Every module can be run from the repository root, ex:
+    python -m benchmarks.build_tree
+"""
@@ -0,0 +1,39 @@
+"""
+Tree building benchmark.
+
+Builds ConfigTree from generated configs of growing size and shows time per config line,
+which should stay (roughly) the same for every size if building time grows linearly.
+
+    python -m benchmarks.build_tree
+"""
+from __future__ import annotations
+from benchmarks.common import REPEAT, measure
+from benchmarks.generator import generate_config
+from config_parser_v5 import ConfigTree
+
+SIZES = (500, 1000, 2000, 4000, 8000)
+
+
+def run(sizes: tuple = SIZES, repeat: int = REPEAT) -> list:
+    """
+    Run benchmark.
+
+    Args:
+        sizes (tuple, optional): number of interfaces in config. Defaults to SIZES.
+        repeat (int, optional): best of N runs. Defaults to REPEAT.
+
+    Returns:
+        list: list of (lines, seconds) tuples
+    """
+    result = []
+    for size in sizes:
+        config_text = generate_config(size)
+        best = measure(lambda: (config_text,), lambda text: ConfigTree(config_text=text), repeat)
+        result.append((config_text.count("\n") + 1, best))
+    return result
+
+
+if __name__ == "__main__":
+    print(f"{'lines':>10} {'time, ms':>10} {'us/line':>10}")
+    for lines, elapsed in run():
+        print(f"{lines:>10} {elapsed * 1000:>10.2f} {elapsed / lines * 1e6:>10.3f}")
@@ -0,0 +1,41 @@
+"""
+Helpers shared by benchmarks: search queries for generated configs (see benchmarks.generator)
+and best of N timing.
+"""
+from __future__ import annotations
+import gc
+import time
+
+REPEAT = 3
+# queries which find lines in configs from generate_config
+SEARCH_QUERIES = ("neighbor 192.168.0.1", r"^interface GigabitEthernet0/1\d$", "ip address 10.0.", "permit tcp")
+
+
+def measure(setup: callable, operation: callable, repeat: int = REPEAT, disable_gc: bool = False) -> float:
+    """
+    Best time of several runs, setup is called before every run and is not measured.
+    Garbage is collected before every run, so garbage of previous run is not counted.
+
+    Args:
+        setup (callable): returns arguments for operation
+        operation (callable): measured operation
+        repeat (int, optional): number of runs. Defaults to REPEAT.
+        disable_gc (bool, optional): disable garbage collector during runs. Defaults to False.
+
+    Returns:
+        float: seconds
+    """
+    best = None
+    for _ in range(repeat):
+        args = setup()
+        gc.collect()
+        if disable_gc:
+            gc.disable()
+        try:
+            start = time.perf_counter()
+            operation(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
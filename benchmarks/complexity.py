@@ -0,0 +1,242 @@
+"""
+Complexity regression check.
+
+Every public operation is run on generated configs of n, 2n, 4n ... interfaces (see
+benchmarks.generator) and growth of its time is compared with declared complexity class.
+Growth is shown as exponent k in t ~ n^k, it is the slope of least squares line through
+(log n, log t) points of all sizes, so one noisy size does not decide the result.
+
+Linear operations should give k close to 1, quadratic ones give k close to 2. Operation
+fails if k is above the limit of its class, failed operations are measured once more
+before they are reported, so single slow run does not fail the check. Exit code is the
+number of failed operations, so the check can be used as is. tests/test_complexity.py
+runs the same check as part of pytest run on small configs, it counts executed lines of
+config_parser_v5 instead of time (see count_lines), so result does not depend on load
+of the machine.
+
+    python -m benchmarks.complexity [--size 200] [--steps 3] [--repeat 5] [--operations merge,delete]
+"""
+from __future__ import annotations
+import argparse
+import math
+import sys
+import types
+
+import config_parser_v5
+from benchmarks.common import SEARCH_QUERIES, measure
+from benchmarks.generator import generate_config, generate_template
+from config_parser_v5 import ConfigTree, Template
+
+SIZE = 200
+# number of sizes, every size is twice the previous one
+STEPS = 3
+REPEAT = 5
+# max exponent for every complexity class, there is some room for noise and memory effects,
+# quadratic operations are far above any of them
+LIMITS = {
+    "linear": 1.35,
+    "nlogn": 1.5,
+}
+# limits for counts of executed lines (see count_lines), there is no noise, and linear count
+# a * n + b always gives k below 1
+COUNT_LIMITS = {
+    "linear": 1.0,
+    "nlogn": 1.35,
+}
+
+
+def operations(interfaces: int) -> dict:
+    """
+    Operations for config of given size.
+
+    Args:
+        interfaces (int): number of interfaces in config
+
+    Returns:
+        dict: name -> (complexity class, setup, operation), setup returns arguments for operation
+    """
+    config_text = generate_config(interfaces)
+    other_text = generate_config(interfaces, seed=1)
+    config = ConfigTree(config_text=config_text)
+    other = ConfigTree(config_text=other_text)
+    template = Template.from_text(generate_template())
+    templated = ConfigTree(config_text=config_text, template=template)
+    data = config.to_bytes()
+    layers = [
+        ConfigTree(config_text=generate_config(interfaces, seed=seed), priority=100 + seed) for seed in range(4)
+    ]
+
+    def search(tree: ConfigTree) -> None:
+        for query in SEARCH_QUERIES:
+            tree.search(query)
+
+    def find(tree: ConfigTree) -> None:
+        for query in SEARCH_QUERIES:
+            tree.find(query)
+
+    def update(tree: ConfigTree, text: str) -> None:
+        tree.update(text)
+
+    return {
+        "parse": ("linear", lambda: (config_text,), lambda text: ConfigTree(config_text=text)),
+        "from_lines": ("linear", lambda: (config_text.split("\n"),), ConfigTree.from_lines),
+        "assigne_template": (
+            "nlogn",
+            lambda: (ConfigTree(config_text=config_text), template),
+            lambda tree, template: template.assigne(tree),
+        ),
+        "show_config": ("linear", lambda: (config,), lambda tree: tree.show_config()),
+        "copy": ("linear", lambda: (config,), lambda tree: tree.copy()),
+        "to_bytes": ("linear", lambda: (config,), lambda tree: tree.to_bytes()),
+        "from_bytes": ("linear", lambda: (data,), ConfigTree.from_bytes),
+        "subtree_hash": ("linear", lambda: (config.copy(),), lambda tree: tree.subtree_hash()),
+        "eq_section": ("linear", lambda: (config.copy(), other.copy()), lambda tree, obj: tree.eq(obj, section=True)),
+        "search": ("linear", lambda: (config,), search),
+        "find": ("linear", lambda: (config,), find),
+        "update": ("linear", lambda: (ConfigTree(config_text=config_text), other_text), update),
+        "merge": ("linear", lambda: (config.copy(), other.copy()), lambda tree, obj: tree.merge(obj)),
+        "merge_all": ("linear", lambda: (layers,), ConfigTree.merge_all),
+        "replace": ("linear", lambda: (config.copy(), other), lambda tree, obj: tree.replace(obj)),
+        "delete": ("linear", lambda: (config.copy(), other.copy()), lambda tree, obj: tree.delete(obj)),
+        "intersection": ("linear", lambda: (config, other), lambda tree, obj: tree.intersection(obj)),
+        "difference": ("linear", lambda: (config, other), lambda tree, obj: tree.difference(obj)),
+        "compliance": ("linear", lambda: (templated, template.tree), lambda tree, obj: tree.compliance(obj)),
+    }
+
+
+def measure_time(setup: callable, operation: callable, repeat: int = REPEAT) -> float:
+    """
+    Best time of several runs, see benchmarks.common.measure. Garbage collector is disabled
+    during runs, so its passes are not counted.
+
+    Args:
+        setup (callable): returns arguments for operation
+        operation (callable): measured operation
+        repeat (int, optional): number of runs. Defaults to REPEAT.
+
+    Returns:
+        float: seconds
+    """
+    return measure(setup, operation, repeat, disable_gc=True)
+
+
+def count_lines(setup: callable, operation: callable, repeat: int = 1) -> int:
+    """
+    Number of executed lines of config_parser_v5, setup is not counted. Count does not depend
+    on load of the machine, so growth of small configs can be checked without noise, but work
+    done inside of builtins (like list.pop or "in" for list) is not counted.
+
+    Args:
+        setup (callable): returns arguments for operation
+        operation (callable): measured operation
+        repeat (int, optional): not used, count is the same for every run. Defaults to 1.
+
+    Returns:
+        int: number of lines
+    """
+    filename = config_parser_v5.__file__
+    count = 0
+
+    def trace_lines(frame: types.FrameType, event: str, arg: object) -> callable:
+        nonlocal count
+        if event == "line":
+            count += 1
+        return trace_lines
+
+    def trace_calls(frame: types.FrameType, event: str, arg: object) -> callable:
+        return trace_lines if frame.f_code.co_filename == filename else None
+
+    args = setup()
+    sys.settrace(trace_calls)
+    try:
+        operation(*args)
+    finally:
+        sys.settrace(None)
+    return count
+
+
+def exponent(sizes: list, times: list) -> float:
+    """
+    Growth exponent k in t ~ n^k, slope of least squares line through (log n, log t).
+
+    Args:
+        sizes (list): sizes, at least two different ones
+        times (list): seconds for every size
+
+    Returns:
+        float: exponent
+    """
+    log_sizes = [math.log(size) for size in sizes]
+    log_times = [math.log(max(seconds, 1e-9)) for seconds in times]
+    size_mean = sum(log_sizes) / len(log_sizes)
+    time_mean = sum(log_times) / len(log_times)
+    covariance = sum((size - size_mean) * (seconds - time_mean) for size, seconds in zip(log_sizes, log_times))
+    return covariance / sum((size - size_mean) ** 2 for size in log_sizes)
+
+
+def check(
+    size: int = SIZE,
+    repeat: int = REPEAT,
+    names: tuple = None,
+    steps: int = STEPS,
+    measure_function: callable = measure_time,
+    limits: dict = LIMITS,
+) -> list:
+    """
+    Measure operations and compare their growth with declared classes.
+
+    Args:
+        size (int, optional): number of interfaces for the smallest config. Defaults to SIZE.
+        repeat (int, optional): best of N runs. Defaults to REPEAT.
+        names (tuple, optional): operations to check, all if None. Defaults to None.
+        steps (int, optional): number of sizes, every one is twice the previous. Defaults to STEPS.
+        measure_function (callable, optional): measure_time or count_lines. Defaults to measure_time.
+        limits (dict, optional): complexity class -> max exponent. Defaults to LIMITS.
+
+    Returns:
+        list: list of (operation, class, sizes, times (or counts), exponent, failed) tuples
+    """
+    sizes = [size << step for step in range(steps)]
+    cases = [operations(interfaces) for interfaces in sizes]
+    result = []
+    for name, (complexity, _, _) in cases[0].items():
+        if names is not None and name not in names:
+            continue
+        limit = limits[complexity]
+        # measure again if limit is exceeded, slow run of the smallest size gives too low k,
+        # so only failed operations are repeated
+        for _ in range(2):
+            times = [measure_function(*case[name][1:], repeat) for case in cases]
+            growth = exponent(sizes, times)
+            if growth <= limit:
+                break
+        result.append((name, complexity, sizes, times, growth, growth > limit))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ConfigTree complexity regression check")
+    parser.add_argument("--size", type=int, default=SIZE, help=f"interfaces in the smallest config, default {SIZE}")
+    parser.add_argument("--steps", type=int, default=STEPS, help=f"number of doubled sizes, default {STEPS}")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="best of N runs")
+    parser.add_argument("--operations", help="comma separated operations to check, all by default")
+    args = parser.parse_args()
+
+    names = tuple(args.operations.split(",")) if args.operations else None
+    result = check(args.size, args.repeat, names, args.steps)
+    header = "".join(f" {f'{1 << step}n, ms' if step else 'n, ms':>10}" for step in range(args.steps))
+    print(f"{'operation':>18} {'class':>8}{header} {'k':>6} {'limit':>6}")
+    for name, complexity, _, times, growth, failed in result:
+        columns = "".join(f" {seconds * 1000:>10.2f}" for seconds in times)
+        print(
+            f"{name:>18} {complexity:>8}{columns} {growth:>6.2f} {LIMITS[complexity]:>6.2f}"
+            f"{'  FAIL' if failed else ''}",
+        )
+    failed = [name for name, _, _, _, _, failed in result if failed]
+    if failed:
+        print(f"operations grow faster than declared: {', '.join(failed)}")
+    sys.exit(len(failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Synthetic IOS-style config generator.
+
+Configs are deterministic: the same arguments always give the same text. Layout of config
+(sections and most of the lines) depends only on size, seed changes some lines in about
+CHANGED share of interfaces and ACLs, so configs with different seeds can be used as
+"intended" and "running" config of the same device.
+
+    interfaces          interface sections with description, addresses, QoS, shutdown
+    BGP                 router bgp with neighbors in global and VRF address-families
+    ACLs                extended access-lists, one per INTERFACES_PER_ACL interfaces
+    banners/cert chains banners with different delimiters and PKI cert chains, they are
+                        cleared by preprocessing
+
+generate_template gives template with {{ VAR }} parameters which matches generated configs.
+"""
+from __future__ import annotations
+import random
+
+# share of interfaces/ACLs which are changed in configs with non zero seed
+CHANGED = 0.1
+INTERFACES_PER_ACL = 10
+BANNER_TYPES = ("motd", "login", "exec")
+CERT_LINE = "  3082024F 308201B8 A0030201 02020101 300D0609 2A864886 F70D0101 05050030"
+
+
+def _interface(i: int, layout: random.Random, changed: bool) -> list:
+    lines = [
+        f"interface GigabitEthernet0/{i}",
+        f" description link-{i}",
+    ]
+    if layout.random() < 0.9:
+        lines.append(f" ip address 10.{i // 250}.{i % 250}.1 255.255.255.0")
+        if layout.random() < 0.2:
+            lines.append(f" ip address 10.{i // 250}.{i % 250}.129 255.255.255.128 secondary")
+    else:
+        lines.append(" no ip address")
+    lines.append(f" ip ospf cost {10 if not changed else 100}")
+    lines.append(" no ip proxy-arp")
+    lines.append(" service-policy output QOS")
+    if changed:
+        lines.append(" shutdown")
+    lines.append("!")
+    return lines
+
+
+def _access_list(i: int, layout: random.Random, changed: bool) -> list:
+    lines = [f"ip access-list extended ACL-{i}"]
+    for entry in range(layout.randint(2, 6)):
+        port = 22 if not changed or entry else 23
+        lines.append(f" permit tcp 10.{i // 250}.{i % 250}.0 0.0.0.255 any eq {port}")
+    lines.append(" deny   ip any any log")
+    return lines
+
+
+def generate_config(
+    interfaces: int,
+    seed: int = 0,
+    banners: int = 1,
+    certs: int = 1,
+    cert_lines: int = 5,
+) -> str:
+    """
+    Generate IOS-style config.
+
+    Args:
+        interfaces (int): number of interface sections, number of BGP neighbors is the same.
+        seed (int, optional): variant of config, 0 - base config. Defaults to 0.
+        banners (int, optional): number of banners. Defaults to 1.
+        certs (int, optional): number of PKI cert chains. Defaults to 1.
+        cert_lines (int, optional): number of lines in every cert. Defaults to 5.
+
+    Returns:
+        str: config text
+    """
+    # layout is the same for all seeds, seed is used only for changes
+    layout = random.Random(interfaces)
+    changes = random.Random(seed)
+
+    def changed() -> bool:
+        return seed != 0 and changes.random() < CHANGED
+
+    lines = [
+        "Building configuration...",
+        "",
+        "Current configuration : 12345 bytes",
+        "!",
+        "version 15.2",
+        "service timestamps debug datetime msec",
+        "hostname R1",
+        "!",
+    ]
+    for i in range(banners):
+        # "^C" is default delimiter, but any "^X" can be configured
+        delimiter = f"^{chr(ord('C') + i % 24)}"
+        lines.append(f"banner {BANNER_TYPES[i % len(BANNER_TYPES)]} {delimiter}")
+        lines.append(f"  Authorized access only {i}")
+        lines.append("  second line with ^ symbol")
+        lines.append(delimiter)
+    for i in range(certs):
+        lines.append(f"crypto pki certificate chain TP-self-signed-{i}")
+        lines.append(" certificate self-signed 01")
+        lines.extend([CERT_LINE] * cert_lines)
+        lines.append("  \tquit")
+    lines.append("!")
+    for i in range(interfaces):
+        lines.extend(_interface(i, layout, changed()))
+    lines.extend(
+        [
+            "router bgp 65000",
+            " bgp router-id 10.255.255.1",
+            " bgp log-neighbor-changes",
+            " neighbor 10.255.255.2 remote-as 65000",
+            " neighbor 10.255.255.2 update-source Loopback0",
+            " !",
+            " address-family vpnv4",
+            "  neighbor 10.255.255.2 activate",
+            "  neighbor 10.255.255.2 send-community extended",
+            " exit-address-family",
+            " !",
+            " address-family ipv4 vrf A",
+        ],
+    )
+    for i in range(interfaces):
+        neighbor = f"192.168.{i // 250}.{i % 250}"
+        lines.append(f"  neighbor {neighbor} remote-as {65001 if not changed() else 65002}")
+        lines.append(f"  neighbor {neighbor} route-map RM in")
+    lines.extend([" exit-address-family", "!"])
+    for i in range(max(1, interfaces // INTERFACES_PER_ACL)):
+        lines.extend(_access_list(i, layout, changed()))
+    lines.extend(
+        [
+            "!",
+            "ip route 0.0.0.0 0.0.0.0 10.0.0.254",
+            "ntp server 10.255.0.1",
+            "ntp server 10.255.0.2",
+            "ip as-path access-list 1 permit ^65000_",
+            "line vty 0 4",
+            " exec-timeout 5 0",
+            " transport input ssh",
+            " login local",
+            "!",
+            "end",
+        ],
+    )
+    return "\n".join(lines)
+
+
+def generate_template() -> str:
+    """
+    Generate template for configs from generate_config.
+
+    Returns:
+        str: template text
+    """
+    return "\n".join(
+        [
+            "service timestamps debug datetime msec",
+            "hostname {{ HOSTNAME }}",
+            "interface {{ INTERFACE }}",
+            " description {{ DESCRIPTION }}",
+            " ip address {{ IP }} {{ MASK }}",
+            " ip ospf cost 10",
+            " no ip proxy-arp",
+            " service-policy output QOS",
+            "router bgp {{ ASN }}",
+            " bgp router-id {{ ROUTER_ID }}",
+            " bgp log-neighbor-changes",
+            " address-family ipv4 vrf {{ VRF }}",
+            "  neighbor {{ NEIGHBOR }} remote-as {{ REMOTE_AS }}",
+            "  neighbor {{ NEIGHBOR }} route-map RM in",
+            "ip access-list extended {{ ACL }}",
+            " permit tcp {{ NETWORK }} {{ WILDCARD }} any eq 22",
+            " deny   ip any any log",
+            "ntp server {{ NTP }}",
+            "line vty 0 4",
+            " exec-timeout 5 0",
+            " transport input ssh",
+        ],
+    )
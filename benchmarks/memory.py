@@ -0,0 +1,128 @@
+"""
+Memory per node report.
+
+Measures memory allocated for ConfigTree with tracemalloc and compares it with the
+same tree made of legacy nodes: object with __dict__ and own lists with skip rules in
+every node (layout of ConfigTree before __slots__).
+
+    python -m benchmarks.memory
+"""
+from __future__ import annotations
+import gc
+import tracemalloc
+
+from benchmarks.generator import generate_config
+from config_parser_v5 import ConfigTree
+
+SIZES = (1000, 4000)
+
+
+class LegacyNode:
+    """Node with layout of ConfigTree before __slots__."""
+
+    def __init__(self, node: ConfigTree, parent: LegacyNode = None) -> None:
+        self.parent = parent
+        self.child = []
+        self.config_line = node.config_line
+        self.attr = node.attr.copy()
+        self.priority = node.priority
+        self.action = node.action
+        self.skip_line = [
+            "!",
+            "end",
+            "exit-address-family",
+        ]
+        self.skip_line_begins_with = [
+            "Building configuration",
+            "Current configuration",
+        ]
+        if parent is not None:
+            parent.child.append(self)
+
+
+def legacy_copy(root: ConfigTree) -> LegacyNode:
+    """
+    Copy tree with legacy nodes.
+
+    Args:
+        root (ConfigTree): tree to copy
+
+    Returns:
+        LegacyNode: root of the copy
+    """
+    legacy_root = LegacyNode(root)
+    stack = [(root, legacy_root)]
+    while stack:
+        node, legacy_node = stack.pop()
+        for child in node.child:
+            stack.append((child, LegacyNode(child, legacy_node)))
+    return legacy_root
+
+
+def count_nodes(root: ConfigTree) -> int:
+    """
+    Count nodes in tree.
+
+    Args:
+        root (ConfigTree): tree
+
+    Returns:
+        int: number of nodes including root
+    """
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.child)
+    return count
+
+
+def traced(func: callable, *args) -> tuple:
+    """
+    Call function and measure memory held by its result.
+
+    Args:
+        func (callable): function to call
+
+    Returns:
+        tuple: (result, allocated bytes)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func(*args)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def run(sizes: tuple = SIZES) -> list:
+    """
+    Run report.
+
+    Args:
+        sizes (tuple, optional): number of interfaces in config. Defaults to SIZES.
+
+    Returns:
+        list: list of (nodes, legacy bytes per node, bytes per node) tuples
+    """
+    result = []
+    for size in sizes:
+        config_text = generate_config(size)
+        tree = ConfigTree(config_text=config_text)
+        nodes = count_nodes(tree)
+        # both copies share config line strings with the tree, so only node layout is compared
+        _, legacy_size = traced(legacy_copy, tree)
+        _, size_ = traced(tree.copy)
+        result.append((nodes, legacy_size / nodes, size_ / nodes))
+    return result
+
+
+if __name__ == "__main__":
+    print(f"{'nodes':>10} {'before, B/node':>15} {'after, B/node':>15}")
+    for nodes, legacy, current in run():
+        print(f"{nodes:>10} {legacy:>15.1f} {current:>15.1f}")
@@ -0,0 +1,87 @@
+"""
+Layered merge benchmark.
+
+Merges dozens of config layers (base, regional, site, device...) with one merge_all call and
+with merge of layer copies one by one in priority order, results are checked to be equal.
+
+    python -m benchmarks.merge_layers
+"""
+from __future__ import annotations
+import time
+
+from benchmarks.generator import generate_config
+from config_parser_v5 import ConfigTree
+
+CASES = ((8, 500), (24, 500), (24, 1000), (48, 1000))
+
+
+def layers(count: int, interfaces: int) -> list:
+    """
+    Config layers with mostly the same lines, every layer has own priority.
+
+    Args:
+        count (int): number of layers
+        interfaces (int): number of interface sections in every layer
+
+    Returns:
+        list: trees
+    """
+    result = []
+    for i in range(count):
+        config_text = generate_config(interfaces).replace("hostname R1", f"hostname R{i}")
+        if i % 3 == 0:
+            config_text = config_text.replace("description link-", f"description layer-{i}-link-")
+        result.append(ConfigTree(config_text=f"{config_text}\nsnmp-server location L{i}", priority=100 + i))
+    return result
+
+
+def merge_sequential(trees: list) -> ConfigTree:
+    """
+    Merge copies of trees one by one in priority order.
+
+    Args:
+        trees (list): trees to merge
+
+    Returns:
+        ConfigTree: merged tree
+    """
+    trees = sorted(trees, key=lambda tree: tree.priority)
+    result = trees[0].copy()
+    for tree in trees[1:]:
+        result.merge(tree.copy())
+    return result
+
+
+def run(cases: tuple = CASES) -> list:
+    """
+    Run benchmark.
+
+    Args:
+        cases (tuple, optional): (layers, interfaces) pairs. Defaults to CASES.
+
+    Returns:
+        list: list of (layers, lines per layer, merge_all seconds, sequential seconds) tuples
+    """
+    result = []
+    for count, interfaces in cases:
+        trees = layers(count, interfaces)
+        start = time.perf_counter()
+        merged = ConfigTree.merge_all(trees)
+        merge_all_time = time.perf_counter() - start
+        start = time.perf_counter()
+        sequential = merge_sequential(trees)
+        sequential_time = time.perf_counter() - start
+        if merged.show_config(raw=True) != sequential.show_config(raw=True):
+            raise AssertionError(f"different results for {count} layers")
+        lines = len(trees[0].show_config().split("\n"))
+        result.append((count, lines, merge_all_time, sequential_time))
+    return result
+
+
+if __name__ == "__main__":
+    print(f"{'layers':>8} {'lines':>8} {'merge_all, ms':>14} {'sequential, ms':>15} {'speedup':>8}")
+    for count, lines, merge_all_time, sequential_time in run():
+        print(
+            f"{count:>8} {lines:>8} {merge_all_time * 1000:>14.1f} {sequential_time * 1000:>15.1f}"
+            f" {sequential_time / merge_all_time:>8.1f}",
+        )
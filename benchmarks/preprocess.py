@@ -0,0 +1,70 @@
+"""
+Preprocessing benchmark.
+
+Compares single pass preprocessing (ConfigTree._preprocess_config) with legacy regex passes
+(one re.search + re.sub per banner and one full pass per junk prefix) on configs with many
+banners and large PKI cert chains.
+
+    python -m benchmarks.preprocess
+"""
+from __future__ import annotations
+import re
+
+from benchmarks.common import measure
+from benchmarks.generator import generate_config
+from config_parser_v5 import ConfigTree
+
+SIZES = (50, 100, 200, 400)
+CERT_LINES = 200
+
+
+def legacy_preprocess(config_text: str) -> str:
+    """
+    Legacy preprocessing with several regex passes over the whole text.
+
+    Args:
+        config_text (str): initial config
+
+    Returns:
+        str: cleared config
+    """
+    while True:
+        banner = re.search(r"\nbanner\s+\S+\s+(\^\S)", config_text)
+        if not banner:
+            break
+        config_text = re.sub(rf"banner \S+ \{banner.group(1)}[\S\s]*?\{banner.group(1)}", "", config_text)
+    config_text = re.sub(r"crypto\s+pki\s+certificate\s+chain\s+[\s\S]*?\n(?=\S)", "", config_text)
+    for line in ConfigTree.parser_config.skip_line_begins_with:
+        config_text = re.sub(rf"{line}.*\n", "", config_text)
+    return re.sub(r"\n\n+(?=\S)", "\n", config_text)
+
+
+def run(sizes: tuple = SIZES) -> list:
+    """
+    Run benchmark.
+
+    Args:
+        sizes (tuple, optional): number of banners/cert chains in config. Defaults to SIZES.
+
+    Returns:
+        list: list of (banners, lines, legacy seconds, seconds) tuples
+    """
+    tree = ConfigTree()
+    result = []
+    for size in sizes:
+        config_text = generate_config(size, banners=size, certs=size, cert_lines=CERT_LINES)
+        result.append(
+            (
+                size,
+                config_text.count("\n") + 1,
+                measure(lambda: (config_text,), legacy_preprocess),
+                measure(lambda: (config_text,), tree._preprocess_config),
+            ),
+        )
+    return result
+
+
+if __name__ == "__main__":
+    print(f"{'banners':>10} {'lines':>10} {'legacy, ms':>12} {'single pass, ms':>16}")
+    for banners, lines, legacy, current in run():
+        print(f"{banners:>10} {lines:>10} {legacy * 1000:>12.2f} {current * 1000:>16.2f}")
@@ -0,0 +1,81 @@
+"""
+Search index benchmark.
+
+Runs the same queries over a fleet of configs with ConfigTree.find on every tree (full tree
+walk) and with SearchIndex (candidates from token index), results are checked to be equal.
+
+    python -m benchmarks.search_index
+"""
+from __future__ import annotations
+import time
+
+from benchmarks.common import measure
+from benchmarks.generator import generate_config
+from config_parser_v5 import ConfigTree, SearchIndex
+
+CONFIGS = 1000
+QUERIES = (
+    "router bgp",
+    "^interface GigabitEthernet0/7$",
+    "neighbor 192.168.0.12 ",
+    "description link-3",
+    "ip address 10.0.1",
+    "service-policy output",
+    "route-map RM in$",
+    "no such line",
+)
+
+
+def fleet(configs: int = CONFIGS) -> dict:
+    """
+    Parse fleet of configs of different size.
+
+    Args:
+        configs (int, optional): number of configs. Defaults to CONFIGS.
+
+    Returns:
+        dict: device name -> tree
+    """
+    return {f"R{i}": ConfigTree(config_text=generate_config(10 + i % 50, seed=i)) for i in range(configs)}
+
+
+def run(configs: int = CONFIGS, queries: tuple = QUERIES) -> tuple:
+    """
+    Run benchmark.
+
+    Args:
+        configs (int, optional): number of configs. Defaults to CONFIGS.
+        queries (tuple, optional): search strings. Defaults to QUERIES.
+
+    Returns:
+        tuple: (nodes, index build seconds, list of (query, found, walk seconds, index seconds))
+    """
+    trees = fleet(configs)
+    start = time.perf_counter()
+    index = SearchIndex(trees)
+    build = time.perf_counter() - start
+    result = []
+    for query in queries:
+
+        def walk(query: str = query) -> list:
+            return [(key, ref.node) for key, tree in trees.items() for ref in tree.find(query)]
+
+        def indexed(query: str = query) -> list:
+            return [(key, ref.node) for key, ref in index.find(query)]
+
+        found = walk()
+        if found != indexed():
+            raise AssertionError(f"different results for {query!r}")
+        result.append((query, len(found), measure(tuple, walk), measure(tuple, indexed)))
+    return len(index._nodes), build, result
+
+
+if __name__ == "__main__":
+    nodes, build, result = run()
+    print(f"{CONFIGS} configs, {nodes} nodes, index built in {build * 1000:.0f} ms")
+    print(f"{'query':>32} {'found':>8} {'walk, ms':>10} {'index, ms':>10} {'speedup':>8}")
+    for query, found, walk_time, index_time in result:
+        print(
+            f"{query:>32} {found:>8} {walk_time * 1000:>10.2f} {index_time * 1000:>10.2f}"
+            f" {walk_time / index_time:>8.1f}",
+        )
@@ -0,0 +1,58 @@
+"""
+Set operations benchmark.
+
+Runs intersection and difference of two configs which differ in few sections for configs of
+growing size and shows time per config line, which should stay (roughly) the same for every
+size if operations grow linearly.
+
+    python -m benchmarks.set_operations
+"""
+from __future__ import annotations
+from benchmarks.common import REPEAT, measure
+from benchmarks.generator import generate_config
+from config_parser_v5 import ConfigTree
+
+SIZES = (500, 1000, 2000, 4000, 8000)
+
+
+def config_pair(interfaces: int) -> tuple:
+    """
+    Two configs with the same sections, some lines in second one are changed (see benchmarks.generator).
+
+    Args:
+        interfaces (int): number of interface sections
+
+    Returns:
+        tuple: (first tree, second tree)
+    """
+    first = ConfigTree(config_text=generate_config(interfaces))
+    second = ConfigTree(config_text=generate_config(interfaces, seed=1))
+    return first, second
+
+
+def run(sizes: tuple = SIZES, repeat: int = REPEAT) -> list:
+    """
+    Run benchmark.
+
+    Args:
+        sizes (tuple, optional): number of interfaces in config. Defaults to SIZES.
+        repeat (int, optional): best of N runs. Defaults to REPEAT.
+
+    Returns:
+        list: list of (lines, intersection seconds, difference seconds) tuples
+    """
+    result = []
+    for size in sizes:
+        first, second = config_pair(size)
+        times = [measure(lambda: (second,), operation, repeat) for operation in (first.intersection, first.difference)]
+        result.append((len(first.show_config().split("\n")), *times))
+    return result
+
+
+if __name__ == "__main__":
+    print(f"{'lines':>10} {'inter, ms':>10} {'us/line':>10} {'diff, ms':>10} {'us/line':>10}")
+    for lines, inter, diff in run():
+        print(
+            f"{lines:>10} {inter * 1000:>10.2f} {inter / lines * 1e6:>10.3f}"
+            f" {diff * 1000:>10.2f} {diff / lines * 1e6:>10.3f}",
+        )
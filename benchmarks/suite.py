@@ -0,0 +1,120 @@
+"""
+Benchmark suite for main ConfigTree operations.
+
+Every operation is measured on generated configs of several sizes (see benchmarks.generator),
+best time of several runs is taken. Preparation of operation arguments (parsing, copies of
+trees which are changed by operation) is not measured. Results are printed and written to
+JSON file, so results of different releases can be compared.
+
+    python -m benchmarks.suite [--output FILE] [--sizes 100,200,400] [--repeat 3]
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import time
+
+from benchmarks.common import REPEAT, SEARCH_QUERIES, measure
+from benchmarks.generator import generate_config, generate_template
+from config_parser_v5 import ConfigTree, __version__
+
+SIZES = (100, 200, 400, 800)
+OUTPUT = "benchmark_results.json"
+
+
+def operations(interfaces: int) -> dict:
+    """
+    Operations for config of given size.
+
+    Args:
+        interfaces (int): number of interfaces in config
+
+    Returns:
+        dict: name -> (setup, operation), setup returns arguments for operation
+    """
+    config_text = generate_config(interfaces)
+    other_text = generate_config(interfaces, seed=1)
+    config = ConfigTree(config_text=config_text)
+    other = ConfigTree(config_text=other_text)
+    template = ConfigTree(config_text=generate_template())
+    templated = ConfigTree(config_text=config_text)
+    templated._assigne_template(template)
+
+    def search(tree: ConfigTree) -> None:
+        for query in SEARCH_QUERIES:
+            tree.search(query)
+
+    return {
+        "parse": (lambda: (config_text,), lambda text: ConfigTree(config_text=text)),
+        "assigne_template": (
+            lambda: (ConfigTree(config_text=config_text), template),
+            lambda tree, template: tree._assigne_template(template),
+        ),
+        "search": (lambda: (config,), search),
+        "merge": (lambda: (config.copy(), other.copy()), lambda tree, obj: tree.merge(obj)),
+        "replace": (lambda: (config.copy(), other), lambda tree, obj: tree.replace(obj)),
+        "delete": (lambda: (config.copy(), other.copy()), lambda tree, obj: tree.delete(obj)),
+        "difference": (lambda: (config, other), lambda tree, obj: tree.difference(obj)),
+        "compliance": (lambda: (templated, template), lambda tree, obj: tree.compliance(obj)),
+    }
+
+
+def run(sizes: tuple = SIZES, repeat: int = REPEAT) -> dict:
+    """
+    Run benchmark suite.
+
+    Args:
+        sizes (tuple, optional): number of interfaces in configs. Defaults to SIZES.
+        repeat (int, optional): best of N runs. Defaults to REPEAT.
+
+    Returns:
+        dict: environment and list of results
+    """
+    results = []
+    for size in sizes:
+        lines = generate_config(size).count("\n") + 1
+        for name, (setup, operation) in operations(size).items():
+            results.append(
+                {
+                    "operation": name,
+                    "interfaces": size,
+                    "lines": lines,
+                    "seconds": measure(setup, operation, repeat),
+                },
+            )
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ConfigTree benchmark suite")
+    parser.add_argument("--output", default=OUTPUT, help=f"JSON file for results, default {OUTPUT}")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in SIZES),
+        help="comma separated numbers of interfaces in configs",
+    )
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="best of N runs")
+    args = parser.parse_args()
+
+    report = run(tuple(int(size) for size in args.sizes.split(",")), args.repeat)
+    print(f"{'operation':>18} {'interfaces':>10} {'lines':>8} {'time, ms':>10} {'us/line':>10}")
+    for result in report["results"]:
+        print(
+            f"{result['operation']:>18} {result['interfaces']:>10} {result['lines']:>8}"
+            f" {result['seconds'] * 1000:>10.2f} {result['seconds'] / result['lines'] * 1e6:>10.3f}",
+        )
+    with open(args.output, "w") as file_:
+        json.dump(report, file_, indent=2)
+    print(f"results are written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
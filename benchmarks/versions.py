@@ -0,0 +1,304 @@
+"""
+Cross-version benchmark.
+
+Runs the same parse, filter/search and merge workloads against every generation of the
+parser (config_parser_v1 ... config_parser_v5) where API of the version allows it, and shows
+throughput (config lines per second) and peak memory of every workload side by side.
+
+Old versions run their own demo scripts on import (with files which are not in the repo),
+so only imports, functions, classes and constants are loaded from them (see load_version).
+Old versions can't clear banners, certs and empty lines, so all versions get the config
+cleared by v5 preprocessing, it is done once and is not measured.
+
+    parse   v1: split_sections, v2: build_tree, v3-v5: ConfigTree(config_text=...)
+    search  v2-v4: filter, v5: search (v1 filter is not finished)
+    merge   v2-v5: merge of two configs with different priority (v1 has no merge)
+
+Configs are generated (see benchmarks.generator) or real configs can be given, then every
+config is merged with the next one.
+
+    python -m benchmarks.versions [--sizes 50,100,200] [--config FILE ...] [--output FILE]
+"""
+from __future__ import annotations
+import argparse
+import ast
+import gc
+import importlib
+import json
+import os
+import platform
+import time
+import tracemalloc
+import types
+import warnings
+
+from benchmarks.common import REPEAT, SEARCH_QUERIES
+from benchmarks.common import measure as measure_time
+from benchmarks.generator import generate_config
+from config_parser_v5 import ConfigTree
+
+VERSIONS = ("v1", "v2", "v3", "v4", "v5")
+WORKLOADS = ("parse", "search", "merge")
+# old versions merge in quadratic time, so sizes are small
+SIZES = (50, 100, 200)
+OUTPUT = "versions_results.json"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_version(version: str) -> types.ModuleType:
+    """
+    Load config_parser_<version>. The latest version is imported as is, for old ones module
+    level code is not run, only imports, functions, classes and assignments of literals are kept.
+
+    Args:
+        version (str): version, like "v1"
+
+    Returns:
+        types.ModuleType: module
+    """
+    name = f"config_parser_{version}"
+    if version == VERSIONS[-1]:
+        return importlib.import_module(name)
+    path = os.path.join(ROOT, f"{name}.py")
+    with open(path, "r") as file_:
+        tree = ast.parse(file_.read(), path)
+
+    def is_definition(node: ast.stmt) -> bool:
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)):
+            return True
+        if isinstance(node, ast.Assign):
+            try:
+                ast.literal_eval(node.value)
+            except ValueError:
+                return False
+            return True
+        return False
+
+    tree.body = [node for node in tree.body if is_definition(node)]
+    module = types.ModuleType(name)
+    module.__file__ = path
+    # v1 imports deprecated sre_constants
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        exec(compile(tree, path, "exec"), module.__dict__)
+    return module
+
+
+def adapters(version: str, module: types.ModuleType) -> dict:
+    """
+    Workload functions for the version.
+
+    Args:
+        version (str): version, like "v1"
+        module (types.ModuleType): loaded version
+
+    Returns:
+        dict: workload -> function, None if version has no API for the workload.
+            parse(text, priority) returns tree, search(tree) and merge(tree, obj) change trees
+    """
+    tree_class = module.ConfigTree
+
+    if version == "v1":
+
+        def parse(text: str, priority: int = 100) -> object:
+            root = tree_class()
+            module.split_sections(text, leaf=root)
+            return root
+
+    elif version == "v2":
+
+        def parse(text: str, priority: int = 100) -> object:
+            root = tree_class(priority=priority)
+            root.build_tree(text)
+            return root
+
+    else:
+
+        def parse(text: str, priority: int = 100) -> object:
+            return tree_class(config_text=text, priority=priority)
+
+    def search(tree: object) -> None:
+        for query in SEARCH_QUERIES:
+            if version == "v5":
+                tree.search(query)
+            else:
+                tree.filter(query)
+
+    def merge(tree: object, obj: object) -> None:
+        tree.merge(obj)
+
+    return {
+        "parse": parse,
+        "search": search if version != "v1" else None,
+        "merge": merge if version != "v1" else None,
+    }
+
+
+def count_nodes(tree: object) -> int:
+    """
+    Number of nodes in tree of any version, root is not counted.
+
+    Args:
+        tree (object): tree
+
+    Returns:
+        int: number of nodes
+    """
+    count = 0
+    stack = list(tree.child)
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.child)
+    return count
+
+
+def measure(setup: callable, operation: callable, repeat: int = REPEAT) -> tuple:
+    """
+    Best time of several runs and peak memory of one more run, setup is called before every
+    run and is not measured. Memory is traced in separate run, as tracing slows down the code.
+
+    Args:
+        setup (callable): returns arguments for operation
+        operation (callable): measured operation
+        repeat (int, optional): number of runs. Defaults to REPEAT.
+
+    Returns:
+        tuple: (seconds, peak memory in bytes)
+    """
+    best = measure_time(setup, operation, repeat)
+    args = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        operation(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def inputs(sizes: tuple = SIZES, config_files: list = None) -> list:
+    """
+    Cleared config pairs for workloads, see module docstring.
+
+    Args:
+        sizes (tuple, optional): number of interfaces in generated configs. Defaults to SIZES.
+        config_files (list, optional): real configs, used instead of generated ones. Defaults to None.
+
+    Returns:
+        list: list of (name, config text, other config text) tuples
+    """
+    cleaner = ConfigTree()
+    if config_files:
+        texts = []
+        for config_file in config_files:
+            with open(config_file, "r") as file_:
+                texts.append(cleaner._preprocess_config(file_.read()))
+        return [
+            (os.path.basename(config_file), text, texts[(indx + 1) % len(texts)])
+            for indx, (config_file, text) in enumerate(zip(config_files, texts))
+        ]
+    return [
+        (
+            f"{size} interfaces",
+            cleaner._preprocess_config(generate_config(size)),
+            cleaner._preprocess_config(generate_config(size, seed=1)),
+        )
+        for size in sizes
+    ]
+
+
+def run(sizes: tuple = SIZES, config_files: list = None, repeat: int = REPEAT, versions: tuple = VERSIONS) -> dict:
+    """
+    Run benchmark.
+
+    Args:
+        sizes (tuple, optional): number of interfaces in generated configs. Defaults to SIZES.
+        config_files (list, optional): real configs, used instead of generated ones. Defaults to None.
+        repeat (int, optional): best of N runs. Defaults to REPEAT.
+        versions (tuple, optional): versions to compare. Defaults to VERSIONS.
+
+    Returns:
+        dict: environment and list of results, seconds and memory are None for unsupported workloads
+    """
+    functions = {version: adapters(version, load_version(version)) for version in versions}
+    results = []
+    for name, text, other_text in inputs(sizes, config_files):
+        lines = text.count("\n") + 1
+        for workload in WORKLOADS:
+            for version in versions:
+                parse = functions[version]["parse"]
+                operation = functions[version][workload]
+                result = {
+                    "input": name,
+                    "lines": lines,
+                    "workload": workload,
+                    "version": version,
+                    "seconds": None,
+                    "peak_bytes": None,
+                    "nodes": None,
+                }
+                results.append(result)
+                if operation is None:
+                    continue
+                # v2 filter moves found nodes to new tree, so trees are parsed for every run
+                setup = {
+                    "parse": lambda: (text,),
+                    "search": lambda: (parse(text),),
+                    "merge": lambda: (parse(text), parse(other_text, 101)),
+                }[workload]
+                result["seconds"], result["peak_bytes"] = measure(setup, operation, repeat)
+                # nodes in result tree show that versions did comparable work
+                if workload == "parse":
+                    result["nodes"] = count_nodes(parse(text))
+                elif workload == "merge":
+                    tree, obj = setup()
+                    operation(tree, obj)
+                    result["nodes"] = count_nodes(tree)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="config_parser cross-version benchmark")
+    parser.add_argument("--output", default=OUTPUT, help=f"JSON file for results, default {OUTPUT}")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in SIZES),
+        help="comma separated numbers of interfaces in generated configs",
+    )
+    parser.add_argument("--config", nargs="+", help="real config files, used instead of generated ones")
+    parser.add_argument("--versions", default=",".join(VERSIONS), help="comma separated versions to compare")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="best of N runs")
+    args = parser.parse_args()
+
+    versions = tuple(args.versions.split(","))
+    report = run(tuple(int(size) for size in args.sizes.split(",")), args.config, args.repeat, versions)
+    # one row for every input and workload, klines/s and peak KiB for every version
+    header = "".join(f" {version + ' kl/s':>10} {'KiB':>8}" for version in versions)
+    print(f"{'input':>18} {'lines':>7} {'workload':>8}{header}")
+    rows = {}
+    for result in report["results"]:
+        rows.setdefault((result["input"], result["lines"], result["workload"]), []).append(result)
+    for (name, lines, workload), results in rows.items():
+        columns = []
+        for result in results:
+            if result["seconds"] is None:
+                columns.append(f" {'-':>10} {'-':>8}")
+            else:
+                columns.append(f" {lines / result['seconds'] / 1000:>10.1f} {result['peak_bytes'] / 1024:>8.0f}")
+        print(f"{name:>18} {lines:>7} {workload:>8}" + "".join(columns))
+    with open(args.output, "w") as file_:
+        json.dump(report, file_, indent=2)
+    print(f"results are written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,702 @@
 from __future__ import annotations
+import bisect
+import hashlib
+import heapq
+import io
+import json
+import mmap
+import os
 import re
+import string
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Iterable, Iterator, TextIO
+
+__version__ = "5.1"
+
+# symbols with special meaning in regex, "." is not here, lines with dots are handled by _ChildIndex
+_RE_SPECIAL = re.compile(r"[\^$*+?{}\[\]\\|()]")
+# not parsed attribute value, ex: "{{ NAME }}"
+_RE_ATTR = re.compile(r"{{ \S+ }}")
+# first line of section with PKI cert
+_RE_CERT_CHAIN = re.compile(r"crypto\s+pki\s+certificate\s+chain(\s|$)")
+_RE_CERT_CHAIN_BYTES = re.compile(_RE_CERT_CHAIN.pattern.encode())
+
+# counted repetition, ex: "{2}", "{1,3}"
+_RE_QUANTIFIER = re.compile(r"\{\d*,?\d*\}")
+
+# binary format of tree: magic, number of nodes, strings, attributes, priorities which are not
+# 64-bit integers, sources of sections, size of string table
+_BYTES_HEADER = struct.Struct("<4sIIIIII")
+_BYTES_MAGIC = b"CTB2"
+# previous format without sources and not 64-bit priorities, it can be loaded
+_BYTES_HEADER_V1 = struct.Struct("<4sIIII")
+_BYTES_MAGIC_V1 = b"CTB1"
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize", "policy"])
+
+# result of batch parsing, error is None or error description
+ParseResult = namedtuple("ParseResult", ["path", "tree", "error"])
+
+# result of ConfigTree.update: lists of top level sections, changed - list of (old, new) pairs
+UpdateResult = namedtuple("UpdateResult", ["added", "removed", "changed"])
+
+# search result without copying: found node and its ancestors from the root of the tree
+NodeRef = namedtuple("NodeRef", ["node", "path"])
+
+# finished phase of work, see Tracer: start - time.perf_counter() value, duration in seconds
+Span = namedtuple("Span", ["name", "start", "duration", "pid", "fields"])
+
+# parser settings, shared by all nodes:
+#   skip_line: skip line (full matching)
+#   skip_line_begins_with: skip line which begins with
+ParserConfig = namedtuple("ParserConfig", ["skip_line", "skip_line_begins_with"])
+
+DEFAULT_PARSER_CONFIG = ParserConfig(
+    skip_line=(
+        "!",
+        "end",
+        "exit-address-family",
+    ),
+    skip_line_begins_with=(
+        "Building configuration",
+        "Current configuration",
+    ),
+)
+
+
+def _first_token(line: str) -> str:
+    """
+    First word of the line, if it can be compared without regex.
+
+    Args:
+        line (str): config line
+
+    Returns:
+        str: first word or None if it contains regex symbols or dots
+    """
+    token = line.split(" ", 1)[0]
+    if not token or token != token.lstrip() or "." in token or _RE_SPECIAL.search(token):
+        return None
+    return token
+
+
+def _mapped_lines(data: mmap.mmap) -> Iterator[bytes]:
+    """
+    Lines of memory-mapped file without line endings, "\r\n" and "\r" are handled as
+    in text mode.
+
+    Args:
+        data (mmap.mmap): mapped file
+
+    Yields:
+        Iterator[bytes]: config lines
+    """
+    for line in iter(data.readline, b""):
+        line = line[:-1] if line.endswith(b"\n") else line
+        line = line[:-1] if line.endswith(b"\r") else line
+        if b"\r" in line:
+            yield from line.split(b"\r")
+        else:
+            yield line
+
+
+def _mask_line(line: str, signature: tuple) -> str:
+    """
+    Replace symbols in positions from signature with dots.
+
+    Args:
+        line (str): line to mask
+        signature (tuple): positions to replace
+
+    Returns:
+        str: masked line
+    """
+    if not signature:
+        return line
+    chars = list(line)
+    for pos in signature:
+        chars[pos] = "."
+    return "".join(chars)
+
+
+def _distinct_plain(plain: dict) -> bool:
+    """
+    Check that plain lines do not match each other, when they are used as regex.
+    Lines with the same length are compared with dots of all of them masked, so the check is
+    strict: some distinct lines can be reported as matched.
+
+    Args:
+        plain (dict): line length -> list of (line, signature)
+
+    Returns:
+        bool: True if lines do not match each other
+    """
+    for lines in plain.values():
+        if len(lines) == 1:
+            continue
+        dots = tuple(set().union(*(signature for _, signature in lines)))
+        if len({_mask_line(line, dots) for line, _ in lines}) != len(lines):
+            return False
+    return True
+
+
+def _priority_to_str(priority: int | float) -> str:
+    """
+    Priority which is not 64-bit integer as string with type tag, see ConfigTree.to_bytes.
+
+    Args:
+        priority (int | float): priority
+
+    Raises:
+        ValueError: priority is not int or float
+
+    Returns:
+        str: "i" or "f" and exact value
+    """
+    if isinstance(priority, int):
+        return f"i{int(priority)}"
+    if isinstance(priority, float):
+        return f"f{priority!r}"
+    raise ValueError(f"priority should be int or float to be serialized, got {type(priority).__name__}")
+
+
+def _priority_from_str(priority: str) -> int | float:
+    """
+    Priority from string made by _priority_to_str.
+
+    Args:
+        priority (str): priority with type tag
+
+    Raises:
+        ValueError: string is not saved priority
+
+    Returns:
+        int | float: priority
+    """
+    if priority[:1] == "i":
+        return int(priority[1:])
+    if priority[:1] == "f":
+        return float(priority[1:])
+    raise ValueError("serialized ConfigTree is broken")
+
+
+def _count_nodes(tree: ConfigTree) -> int:
+    """
+    Number of nodes in the tree, root is not counted.
+
+    Args:
+        tree (ConfigTree): tree
+
+    Returns:
+        int: number of nodes
+    """
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += len(node.child)
+        stack.extend(node.child)
+    return count
+
+
+class _ChildIndex:
+    """
+    Lookup index for childs of ConfigTree node.
+
+    Childs without attributes and regex symbols (except dots) are "plain" lines. Config line of
+    plain child used as regex matches only lines with the same length and the same symbols in
+    all positions except dots, so plain childs are stored in hash maps keyed by line and dots
+    positions (signature). All other childs (templates, lines with regex symbols) are stored in
+    separate list and are checked with regex as before.
+    """
+
+    __slots__ = ("exact", "plain", "masked", "templated")
+
+    def __init__(self, child: list) -> None:
+        # line -> index of first plain child with this line
+        self.exact = {}
+        # line length -> signature -> line -> index of first plain child
+        self.plain = {}
+        # (line length, signature of query) -> masked line -> index of first plain child
+        self.masked = {}
+        # indexes of childs which need regex matching, sorted
+        self.templated = []
+        for indx, node in enumerate(child):
+            self.add(indx, node)
+
+    def add(self, indx: int, node: ConfigTree) -> None:
+        """
+        Add child to index, child index should be greater than all indexed ones.
+
+        Args:
+            indx (int): index in child list
+            node (ConfigTree): child object
+        """
+        signature = node._signature()
+        if signature is None:
+            self.templated.append(indx)
+            return
+        line = node.config_line
+        self.exact.setdefault(line, indx)
+        self.plain.setdefault(len(line), {}).setdefault(signature, {}).setdefault(line, indx)
+        for (length, query_signature), masked in self.masked.items():
+            if length == len(line):
+                masked.setdefault(_mask_line(line, query_signature), indx)
+
+    def match(self, line: str) -> int:
+        """
+        Find first plain child which matches line (child is used as regex).
+
+        Args:
+            line (str): line to match
+
+        Returns:
+            int: index of child or None
+        """
+        found = None
+        for signature, lines in self.plain.get(len(line), {}).items():
+            indx = lines.get(_mask_line(line, signature))
+            if indx is not None and (found is None or indx < found):
+                found = indx
+        return found
+
+    def match_masked(self, line: str, signature: tuple, child: list) -> int:
+        """
+        Find first plain child which is matched by line (line is used as regex).
+
+        Args:
+            line (str): line to match with, can contain dots only as regex symbols
+            signature (tuple): dots positions in line
+            child (list): indexed child list
+
+        Returns:
+            int: index of child or None
+        """
+        key = (len(line), signature)
+        masked = self.masked.get(key)
+        if masked is None:
+            masked = self.masked[key] = {}
+            for indx, node in enumerate(child):
+                child_line = node.config_line
+                if len(child_line) == len(line) and node._signature() is not None:
+                    masked.setdefault(_mask_line(child_line, signature), indx)
+        return masked.get(line)
+
+
+class _ChildList(list):
+    """List of childs, drops lookup index and subtree hashes of owner on every change."""
+
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: ConfigTree, *args) -> None:
+        super().__init__(*args)
+        self._owner = owner
+
+    def _invalidate(self) -> None:
+        owner = getattr(self, "_owner", None)
+        if owner is not None:
+            owner._index = None
+            owner._drop_merkle()
+
+    def append(self, node: ConfigTree) -> None:
+        super().append(node)
+        owner = getattr(self, "_owner", None)
+        if owner is None:
+            return
+        # appending is the most frequent change, so index is updated instead of dropping
+        index = getattr(owner, "_index", None)
+        if index is not None:
+            index.add(len(self) - 1, node)
+        owner._drop_merkle()
+
+    def extend(self, nodes: Iterable) -> None:
+        super().extend(nodes)
+        self._invalidate()
+
+    def insert(self, indx: int, node: ConfigTree) -> None:
+        super().insert(indx, node)
+        self._invalidate()
+
+    def pop(self, indx: int = -1) -> ConfigTree:
+        node = super().pop(indx)
+        self._invalidate()
+        return node
+
+    def remove(self, node: ConfigTree) -> None:
+        super().remove(node)
+        self._invalidate()
+
+    def clear(self) -> None:
+        super().clear()
+        self._invalidate()
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._invalidate()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._invalidate()
+
+    def __setitem__(self, indx, value) -> None:
+        super().__setitem__(indx, value)
+        self._invalidate()
+
+    def __delitem__(self, indx) -> None:
+        super().__delitem__(indx)
+        self._invalidate()
+
+    def __iadd__(self, nodes: Iterable) -> _ChildList:
+        self.extend(nodes)
+        return self
+
+    def __imul__(self, count: int) -> _ChildList:
+        result = super().__imul__(count)
+        self._invalidate()
+        return result
+
+
+class _AttrDict(dict):
+    """
+    Parsed attributes of node, drops rendered line, hashes and parent index of owner on every
+    change. Created by _attr_dict, owner is set after the dict is filled.
+    """
+
+    __slots__ = ("_owner",)
+
+    def _invalidate(self) -> None:
+        owner = getattr(self, "_owner", None)
+        if owner is not None:
+            owner._changed()
+
+    def __setitem__(self, key: str, value: str) -> None:
+        super().__setitem__(key, value)
+        self._invalidate()
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self._invalidate()
+
+    def __ior__(self, other: dict) -> _AttrDict:
+        super().__ior__(other)
+        self._invalidate()
+        return self
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self._invalidate()
+
+    def setdefault(self, key: str, default: str = None) -> str:
+        value = super().setdefault(key, default)
+        self._invalidate()
+        return value
+
+    def pop(self, *args) -> str:
+        value = super().pop(*args)
+        self._invalidate()
+        return value
+
+    def popitem(self) -> tuple:
+        item = super().popitem()
+        self._invalidate()
+        return item
+
+    def clear(self) -> None:
+        super().clear()
+        self._invalidate()
+
+
+def _attr_dict(owner: ConfigTree, attr: dict) -> _AttrDict:
+    """
+    Attributes dict of the node, see _AttrDict.
+
+    Args:
+        owner (ConfigTree): node
+        attr (dict): attributes
+
+    Returns:
+        _AttrDict: attributes bound to the node
+    """
+    result = _AttrDict(attr)
+    result._owner = owner
+    return result
+
+
+class PatternCache:
+    """
+    Bounded cache of compiled regex patterns.
+    One instance is shared by all ConfigTree objects (ConfigTree.pattern_cache), patterns for
+    template lines are compiled once instead of every comparison.
+    """
+
+    POLICIES = ("lru", "fifo")
+
+    def __init__(self, maxsize: int = 4096, policy: str = "lru") -> None:
+        """
+        Compiled regex cache.
+
+        Args:
+            maxsize (int, optional): max number of patterns, 0 disables caching. Defaults to 4096.
+            policy (str, optional): eviction policy:
+                lru: least recently used pattern is evicted
+                fifo: the oldest pattern is evicted
+                Defaults to "lru".
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown eviction policy '{policy}', expected one of {self.POLICIES}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self._patterns = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self: PatternCache) -> int:
+        return len(self._patterns)
+
+    def get(self: PatternCache, key: tuple) -> re.Pattern:
+        """
+        Get compiled pattern from cache.
+
+        Args:
+            key (tuple): pattern key
+
+        Returns:
+            re.Pattern: compiled pattern or None if pattern is not cached
+        """
+        pattern = self._patterns.get(key)
+        if pattern is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == "lru":
+            self._patterns.move_to_end(key)
+        return pattern
+
+    def put(self: PatternCache, key: tuple, pattern: re.Pattern) -> re.Pattern:
+        """
+        Store compiled pattern in cache, evict patterns over maxsize.
+
+        Args:
+            key (tuple): pattern key
+            pattern (re.Pattern): compiled pattern
+
+        Returns:
+            re.Pattern: the same pattern
+        """
+        if self.maxsize <= 0:
+            return pattern
+        self._patterns[key] = pattern
+        while len(self._patterns) > self.maxsize:
+            self._patterns.popitem(last=False)
+            self.evictions += 1
+        return pattern
+
+    def resize(self: PatternCache, maxsize: int) -> None:
+        """
+        Change cache size, evict patterns over new maxsize.
+
+        Args:
+            maxsize (int): max number of patterns
+        """
+        self.maxsize = maxsize
+        while len(self._patterns) > max(maxsize, 0):
+            self._patterns.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self: PatternCache) -> None:
+        """Drop all patterns and statistics."""
+        self._patterns.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def cache_info(self: PatternCache) -> CacheInfo:
+        """
+        Cache statistics.
+
+        Returns:
+            CacheInfo: hits, misses, evictions, maxsize, currsize, policy
+        """
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._patterns), self.policy)
+
+
+class Tracer:
+    """
+    Tracer of parsing phases, default one is disabled and does nothing.
+    One instance is shared by all ConfigTree objects (ConfigTree.tracer). Phases check enabled
+    flag before any measuring, so disabled tracer costs one attribute lookup per phase. Tracer
+    with enabled flag gets finished spans in emit. Phases and their fields:
+        preprocess  source, input_lines, input_size (chars or bytes), lines - lines after
+                    preprocessing, reading of input is measured here as well
+        build       source, lines, nodes
+        template    nodes, template_nodes
+        compliance  nodes, template_nodes, add, remove - number of lines to add/remove
+    source is config file name or None.
+    """
+
+    enabled = False
+
+    def emit(self: Tracer, span: Span) -> None:
+        """
+        Handle finished span.
+
+        Args:
+            span (Span): finished span
+        """
+
+    def record(self: Tracer, name: str, start: float, end: float, **fields) -> None:
+        """
+        Emit span of the phase.
+
+        Args:
+            name (str): phase name
+            start (float): time.perf_counter() at phase start
+            end (float): time.perf_counter() at phase end
+            fields: phase details, see Tracer
+        """
+        self.emit(Span(name, start, end - start, os.getpid(), fields))
+
+
+class TraceRecorder(Tracer):
+    """
+    Tracer which keeps all spans and aggregates them per config file.
+    Spans without config file name (template, compliance) are assigned to the current file
+    (see file), spans of parse_many workers are sent back to parent process. Spans can be
+    saved as JSON with per file summary or as Chrome trace-event file (chrome://tracing,
+    Perfetto).
+
+        ConfigTree.tracer = TraceRecorder()
+        with ConfigTree.tracer.file(path):
+            config = ConfigTree(config_file=path, template=template)
+            config.compliance(template)
+        ConfigTree.tracer.save("trace.json", output_format="chrome")
+    """
+
+    enabled = True
+    FORMATS = ("json", "chrome")
+
+    def __init__(self: TraceRecorder) -> None:
+        """
+        Tracer which keeps spans in memory.
+        """
+        self.spans = []
+        # file which is processed now, see file
+        self.source = None
+
+    def emit(self: TraceRecorder, span: Span) -> None:
+        if span.fields.get("source") is None and self.source is not None:
+            span.fields["source"] = self.source
+        self.spans.append(span)
+
+    @contextmanager
+    def file(self: TraceRecorder, source: str) -> Iterator[None]:
+        """
+        Assign spans to config file.
+
+        Args:
+            source (str): config file name
+        """
+        previous, self.source = self.source, source
+        try:
+            yield
+        finally:
+            self.source = previous
+
+    def clear(self: TraceRecorder) -> None:
+        """
+        Drop all spans.
+        """
+        self.spans = []
+
+    def summary(self: TraceRecorder) -> dict:
+        """
+        Spans aggregated per config file and phase.
+
+        Returns:
+            dict: source -> phase -> {"count": spans, "seconds": total duration, field: sum},
+                spans without source are under "<text>"
+        """
+        result = {}
+        for span in self.spans:
+            source = span.fields.get("source") or "<text>"
+            phase = result.setdefault(source, {}).setdefault(span.name, {"count": 0, "seconds": 0.0})
+            phase["count"] += 1
+            phase["seconds"] += span.duration
+            for field, value in span.fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    phase[field] = phase.get(field, 0) + value
+        return result
+
+    def save(self: TraceRecorder, path: str, output_format: str = "json") -> None:
+        """
+        Save spans to file.
+
+        Args:
+            path (str): file name
+            output_format (str, optional): file format:
+                json: per file summary and list of spans
+                chrome: Chrome trace-event format
+                Defaults to "json".
+        """
+        if output_format not in self.FORMATS:
+            raise ValueError(f"unknown trace format '{output_format}', expected one of {self.FORMATS}")
+        if output_format == "json":
+            data = {
+                "files": self.summary(),
+                "spans": [span._asdict() for span in self.spans],
+            }
+        else:
+            data = {
+                "traceEvents": [
+                    {
+                        "name": span.name,
+                        "cat": "config_parser",
+                        "ph": "X",
+                        "ts": span.start * 1e6,
+                        "dur": span.duration * 1e6,
+                        "pid": span.pid,
+                        "tid": 0,
+                        "args": span.fields,
+                    }
+                    for span in self.spans
+                ],
+                "displayTimeUnit": "ms",
+            }
+        with open(path, "w") as file_:
+            json.dump(data, file_, indent=2)
 
 
 class ConfigTree:
+    __slots__ = (
+        "parent",
+        "child",
+        "_index",
+        "_config_line",
+        "_attr",
+        "_str",
+        "_str_stripped",
+        "_plain_signature",
+        "_merkle",
+        "_source",
+        "priority",
+        "action",
+    )
+    # compiled patterns for templates, shared by all objects
+    pattern_cache = PatternCache()
+    # skip rules, shared by all objects
+    parser_config = DEFAULT_PARSER_CONFIG
+    # tracer of parsing phases, shared by all objects, disabled by default
+    tracer = Tracer()
+
     def __init__(
         self,
         config_line: str = "",
@@ -11,6 +705,7 @@ class ConfigTree:
         template_file: str = None,
         parent: ConfigTree = None,
         priority: int = 100,
+        template: Template = None,
     ) -> None:
         """
         Text config to tree converter.
@@ -22,148 +717,211 @@ class ConfigTree:
             template_file (str, optional): file to read template from. Defaults to None.
             parent (ConfigTree, optional): parent node. Defaults to None.
             priority (int, optional): priority for merging. Defaults to 100.
+            template (Template, optional): precompiled template, used instead of template_file. Defaults to None.
         """
         # link to parent object
         self.parent = parent
         # list of child objects
-        self.child = []
+        self.child = _ChildList(self)
+        # lookup index for child objects, built on demand
+        self._index = None
         #  raw config line
-        self.config_line = config_line
+        self._config_line = config_line
         # dict with parsed attributes, if exists - '{{ NAME }}'
-        self.attr = self._get_attr(config_line)
+        self._attr = _attr_dict(self, self._get_attr(config_line))
+        # rendered line and its stripped form, built on demand, see __str__
+        self._str = None
+        self._str_stripped = None
+        # dots positions for plain line, False if not calculated yet, see _signature
+        self._plain_signature = False
+        # subtree hashes, None if not calculated yet, see _merkle_hashes
+        self._merkle = None
+        # source of top level section, set by update
+        self._source = None
         # set priority for meerging
         self.priority = priority
         # mark + or - for comparing result, like to git notation
         self.action = ""
-        # skip line (full matching)
-        self.skip_line = [
-            "!",
-            "end",
-            "exit-address-family",
-        ]
-        # skip line which begins with
-        self.skip_line_begins_with = [
-            "Building configuration",
-            "Current configuration",
-        ]
         # if parent specified, add us to parent's childs
         if parent is not None:
             parent.child.append(self)
-        # if config from file - read config to mem
+        # if config from file - build tree line by line
         if config_file is not None:
             with open(config_file, "r") as file_:
-                config_text = file_.read().strip()
-        # if config was readed from file or direct specifid - build tree
+                self._parse_lines(file_, source=config_file)
+        # if config was direct specifid - build tree
         if config_text is not None:
-            config_text = self._preprocess_config(config_text)
-            self._build_tree(config_text)
+            self._parse_lines(config_text.split("\n"))
         # parce and assigne template to config
-        if template_file is not None:
-            with open(template_file, "r") as file_:
-                template_text = file_.read().strip()
-            self._assigne_template(ConfigTree(config_text=template_text))
-
-    def __str__(self: ConfigTree) -> str:
-        # config line with values instead of parameters
-        return self._format_config_line(mode="full")
-
-    def __repr__(self: ConfigTree) -> str:
-        # config line with values instead of parameters and ID
-        line = self._format_config_line(mode="full")
-        return f"({id(self)}) {line}"
-
-    def _remove_banners(self: ConfigTree, config_text: str) -> str:
-        # TODO: add banner parsing
+        if template is not None:
+            self._assigne_template(template)
+        elif template_file is not None:
+            self._assigne_template(self._read_template(template_file))
+
+    @classmethod
+    def from_lines(
+        cls,
+        lines: Iterable[str],
+        template_file: str = None,
+        priority: int = 100,
+        template: Template = None,
+    ) -> ConfigTree:
         """
-        remove banners from config.
+        Build tree from config lines.
+        Lines are preprocessed and attached to the tree one by one, as they come from
+        iterator, so full config text is not kept in memory.
 
         Args:
-            config_text (str): initial config
+            lines (Iterable[str]): config lines, can be with or without line endings.
+            template_file (str, optional): file to read template from. Defaults to None.
+            priority (int, optional): priority for merging. Defaults to 100.
+            template (Template, optional): precompiled template, used instead of template_file. Defaults to None.
+
         Returns:
-            str: cleared config
+            ConfigTree: root of the tree
         """
-        while True:
-            banner = re.search(r"\nbanner\s+\S+\s+(\^\S)", config_text)
-            if not banner:
-                return config_text
-            config_text = re.sub(
-                rf"banner \S+ \{banner.group(1)}[\S\s]*?\{banner.group(1)}",
-                "",
-                config_text,
-            )
+        root = cls(priority=priority)
+        root._parse_lines(lines, source=getattr(lines, "name", None))
+        if template is not None:
+            root._assigne_template(template)
+        elif template_file is not None:
+            root._assigne_template(root._read_template(template_file))
+        return root
 
-    def _remove_cert_chain(self: ConfigTree, config_text: str) -> str:
+    @classmethod
+    def from_stream(
+        cls,
+        stream: TextIO,
+        template_file: str = None,
+        priority: int = 100,
+        template: Template = None,
+    ) -> ConfigTree:
         """
-        Remove sections with PIK cert.
+        Build tree from file object line by line, see from_lines.
 
         Args:
-            config_text (str): initial config
+            stream (TextIO): file object opened in text mode.
+            template_file (str, optional): file to read template from. Defaults to None.
+            priority (int, optional): priority for merging. Defaults to 100.
+            template (Template, optional): precompiled template, used instead of template_file. Defaults to None.
 
         Returns:
-            str: cleared config
+            ConfigTree: root of the tree
         """
-        config_text = re.sub(
-            r"crypto\s+pki\s+certificate\s+chain\s+[\s\S]*?\n(?=\S)",
-            "",
-            config_text,
-        )
-        return config_text
+        return cls.from_lines(stream, template_file=template_file, priority=priority, template=template)
 
-    def _remove_junk_lines(self: ConfigTree, config_text: str) -> str:
+    @classmethod
+    def from_mmap(
+        cls,
+        path: str,
+        template_file: str = None,
+        priority: int = 100,
+        template: Template = None,
+        encoding: str = "utf-8",
+    ) -> ConfigTree:
         """
-        Remove junk lines which describes skip_line_begins_with list.
+        Build tree from memory-mapped file, for configs which are too large to be read.
+        Preprocessing runs over mapped bytes, so banners, PKI certs and junk lines are never
+        decoded, other lines are decoded one by one when they are attached to the tree.
 
         Args:
-            config_text (str): initial config
+            path (str): file to read config from
+            template_file (str, optional): file to read template from. Defaults to None.
+            priority (int, optional): priority for merging. Defaults to 100.
+            template (Template, optional): precompiled template, used instead of template_file. Defaults to None.
+            encoding (str, optional): config file encoding. Defaults to "utf-8".
 
         Returns:
-            str: cleared config
+            ConfigTree: root of the tree
         """
-        for line in self.skip_line_begins_with:
-            config_text = re.sub(rf"{line}.*\n", "", config_text)
-        return config_text
+        root = cls(priority=priority)
+        with open(path, "rb") as file_:
+            # empty file can not be mapped
+            if os.fstat(file_.fileno()).st_size != 0:
+                with mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    root._parse_lines(_mapped_lines(data), source=path, encoding=encoding)
+        if template is not None:
+            root._assigne_template(template)
+        elif template_file is not None:
+            root._assigne_template(root._read_template(template_file))
+        return root
 
-    def _remove_empty_lines(self: ConfigTree, config_text: str) -> str:
-        """
-        Remove empty lines: several consecutive \\n.
+    @property
+    def skip_line(self: ConfigTree) -> tuple:
+        # skip line (full matching)
+        return self.parser_config.skip_line
 
-        Args:
-            config_text (str): initial config
+    @property
+    def skip_line_begins_with(self: ConfigTree) -> tuple:
+        # skip line which begins with
+        return self.parser_config.skip_line_begins_with
+
+    @property
+    def config_line(self: ConfigTree) -> str:
+        # raw config line
+        return self._config_line
+
+    @config_line.setter
+    def config_line(self: ConfigTree, config_line: str) -> None:
+        if config_line != self._config_line:
+            self._config_line = config_line
+            self._changed()
+
+    @property
+    def attr(self: ConfigTree) -> dict:
+        # dict with parsed attributes, can be replaced or changed in place
+        return self._attr
+
+    @attr.setter
+    def attr(self: ConfigTree, attr: dict) -> None:
+        changed = attr != self._attr
+        self._attr = _attr_dict(self, attr)
+        if changed:
+            self._changed()
 
-        Returns:
-            str: cleared config
-        """
-        config_text = re.sub(
-            r"\n\n+(?=\S)",
-            "\n",
-            config_text,
-        )
-        return config_text
+    def __str__(self: ConfigTree) -> str:
+        # config line with values instead of parameters, rendered once
+        line = self._str
+        if line is None:
+            line = self._str = self._format_config_line(mode="full")
+        return line
 
-    def _search(self: ConfigTree, string: str, with_child: bool, raw: bool) -> list:
+    def __repr__(self: ConfigTree) -> str:
+        # config line with values instead of parameters and ID
+        return f"({id(self)}) {self}"
+
+    def _stripped(self: ConfigTree) -> str:
+        # rendered config line without leading/trailing spaces, rendered once
+        line = self._str_stripped
+        if line is None:
+            line = self._str_stripped = str(self).strip()
+        return line
+
+    def _search(
+        self: ConfigTree,
+        string: str | re.Pattern,
+        with_child: bool,
+        raw: bool,
+        limit: int = None,
+        depth: int = None,
+    ) -> list:
         """
-        Internal function for recursive search.
+        Internal function for search, found objects are copied with their parents.
 
         Args:
-            string (str): String to search. Can be regex
+            string (str | re.Pattern): String to search. Can be regex or compiled pattern
             with_child (bool): Deep search, in child objects also. Defaults to True.
             raw (bool): Search in templated config (True) or compiled config (False). Defaults to False.
+            limit (int, optional): stop after limit found objects. Defaults to None (no limit).
+            depth (int, optional): max depth of searched objects, 1 - childs only. Defaults to None (no limit).
 
         Returns:
             list: list of finded objects.
         """
-        result = []
-        for child in self.child:
-            if raw:
-                line = str(child.config_line).strip()
-            else:
-                line = str(child).strip()
-            match = re.search(rf"{string.strip()}", line)
-            if match:
-                result.append(child.copy(with_child=with_child))
-            if len(child.child) != 0 and (not match or with_child):
-                result.extend(child._search(string, with_child, raw))
-        return result
+        return [
+            node.copy(with_child=with_child)
+            for node, _ in self.find(string, with_child=with_child, raw=raw, limit=limit, depth=depth)
+        ]
 
     def _format_config_line(self: ConfigTree, mode: str = "re") -> str:
         """
@@ -215,9 +973,75 @@ class ConfigTree:
         else:
             return cmd
 
+    def _read_template(self: ConfigTree, template_file: str) -> ConfigTree:
+        """
+        Read template from file.
+
+        Args:
+            template_file (str): file to read template from
+
+        Returns:
+            ConfigTree: template tree
+        """
+        with open(template_file, "r") as file_:
+            return ConfigTree.from_stream(file_)
+
+    def _preprocess_lines(self: ConfigTree, lines: Iterable[str], binary: bool = False) -> Iterator[str]:
+        """
+        Preprocessing config line by line: clear banners, PKI certs, junk/empty lines.
+        State machine:
+            config: line is passed to output if it is not junk or empty line
+            banner: lines are skipped up to closing delimiter (started with "banner <type> <delimiter>",
+                delimiter is "^C" like symbol pair or any single symbol)
+            cert: PKI cert section is skipped up to the next not indented line, banners inside
+                the section do not break it
+
+        Args:
+            lines (Iterable[str]): config lines
+            binary (bool, optional): lines are bytes, not decoded text. Defaults to False.
+
+        Yields:
+            Iterator[str]: cleared config lines (bytes if binary)
+        """
+        skip_line_begins_with = tuple(self.skip_line_begins_with)
+        banner_word, caret, cert_chain = "banner", "^", _RE_CERT_CHAIN
+        if binary:
+            skip_line_begins_with = tuple(prefix.encode() for prefix in skip_line_begins_with)
+            banner_word, caret, cert_chain = b"banner", b"^", _RE_CERT_CHAIN_BYTES
+        delimiter = None
+        cert = False
+        for line in lines:
+            # banners are cleared first, the same as tail of the line after closing delimiter
+            if delimiter is None and line.startswith(banner_word):
+                banner = line.split(None, 2)
+                if banner[0] == banner_word and len(banner) == 3:
+                    line = banner[2]
+                    delimiter = line[:2] if line[:1] == caret and len(line.rstrip()) > 1 else line[:1]
+                    line = line[len(delimiter) :]
+            if delimiter is not None:
+                pos = line.find(delimiter)
+                if pos == -1:
+                    continue
+                line = line[pos + len(delimiter) :]
+                delimiter = None
+            if not line.strip():
+                continue
+            # PKI cert section is skipped up to the next not indented line
+            if cert:
+                if line[:1].isspace():
+                    continue
+                cert = False
+            if cert_chain.match(line):
+                cert = True
+                continue
+            if line.lstrip().startswith(skip_line_begins_with):
+                continue
+            yield line
+
     def _preprocess_config(self: ConfigTree, config_text: str) -> str:
         """
         Preprocessing config: clear banner, junk/empty lines etc.
+        Config is scanned once, see _preprocess_lines.
 
         Args:
             config_text (str): initial config
@@ -225,39 +1049,70 @@ class ConfigTree:
         Returns:
             str: cleared config
         """
-        config_text = self._remove_banners(config_text)
-        config_text = self._remove_cert_chain(config_text)
-        config_text = self._remove_junk_lines(config_text)
-        config_text = self._remove_empty_lines(config_text)
-        return config_text
+        return "\n".join(self._preprocess_lines(config_text.split("\n")))
 
-    def _build_sub_tree(self: ConfigTree, section: str, parent: ConfigTree) -> None:
+    def _parse_lines(self: ConfigTree, lines: Iterable, source: str = None, encoding: str = None) -> None:
         """
-        Parse cnofig line and build sub-tree if this is susction.
+        Preprocess config lines and build tree from them, lines go through both phases one by one.
+        With enabled tracer (see Tracer) time of getting every preprocessed line is summed up as
+        preprocess phase, the rest is build phase. Phases run together, so both spans start at
+        the beginning of parsing, lines are streamed as without tracer.
 
         Args:
-            section (str): config text
-            parent (ConfigTree): parent object
+            lines (Iterable): config lines
+            source (str, optional): config file name for tracer. Defaults to None.
+            encoding (str, optional): lines are bytes, they are decoded after preprocessing. Defaults to None.
         """
-        lines = section.split("\n")
-        # if no line or line should be skiped, or this is comment which is started from
-        # "skip_line", like "!some comment need to be skipped"
-        if len(lines) == 0:
-            return
-        elif len(lines[0]) == 0:
-            return
-        elif lines[0].strip() in self.skip_line or lines[0][0] in self.skip_line:
+        binary = encoding is not None
+        tracer = self.tracer
+        if not tracer.enabled:
+            lines = self._preprocess_lines(lines, binary)
+            if binary:
+                lines = (line.decode(encoding) for line in lines)
+            self._build_tree_from_lines(lines)
             return
-        # store config line
-        child = ConfigTree(config_line=lines[0].strip(), parent=parent, priority=self.priority)
-        if len(lines) == 1:
-            return
-        # shift subsection to the left (remove spaces from the line begin)
-        spaces = re.match(r"^(\s+)", lines[1]).group(1)
-        sub_lines = [line.replace(spaces, "", 1) for line in lines[1:]]
-        sub_section = "\n".join(sub_lines)
-        # recursively build tree from section
-        child._build_tree(sub_section)
+        stats = {"input_lines": 0, "input_size": 0, "lines": 0, "seconds": 0.0}
+
+        def read(lines: Iterable) -> Iterator:
+            for line in lines:
+                stats["input_lines"] += 1
+                stats["input_size"] += len(line)
+                yield line
+
+        def preprocessed(lines: Iterator) -> Iterator[str]:
+            perf_counter = time.perf_counter
+            while True:
+                start = perf_counter()
+                line = next(lines, None)
+                if line is not None and binary:
+                    line = line.decode(encoding)
+                stats["seconds"] += perf_counter() - start
+                if line is None:
+                    return
+                stats["lines"] += 1
+                yield line
+
+        nodes = _count_nodes(self)
+        start = time.perf_counter()
+        self._build_tree_from_lines(preprocessed(self._preprocess_lines(read(lines), binary)))
+        end = time.perf_counter()
+        tracer.record(
+            "preprocess",
+            start,
+            start + stats["seconds"],
+            source=source,
+            input_lines=stats["input_lines"],
+            input_size=stats["input_size"],
+            lines=stats["lines"],
+        )
+        tracer.record(
+            "build",
+            start,
+            end - stats["seconds"],
+            source=source,
+            lines=stats["lines"],
+            nodes=_count_nodes(self) - nodes,
+        )
 
     def _build_tree(self: ConfigTree, config_text: str) -> None:
         """
@@ -266,9 +1121,51 @@ class ConfigTree:
         Args:
             config_text (str): config in plain text
         """
-        sections = re.split(r"\n(?=\S)", config_text)
-        for section in sections:
-            self._build_sub_tree(section, self)
+        self._build_tree_from_lines(config_text.split("\n"))
+
+    def _build_tree_from_lines(self: ConfigTree, lines: Iterable[str]) -> None:
+        """
+        Build tree from config lines in single pass.
+        Every line is attached to its parent with help of indentation stack, sections are not
+        re-joined and re-splitted on every nesting level. Indentation of the section is defined
+        by its first child line, this indentation is removed from all next lines of the section
+        and lines which are still indented are considered as nested ones.
+        Empty lines are ignored.
+
+        Args:
+            lines (Iterable[str]): config lines
+        """
+        # stack[i] - current section on level i (None if section is skipped)
+        # shift[i] - indentation of stack[i] childs, defined by the first child line
+        skip_line = self.skip_line
+        stack = [self]
+        shift = [0]
+        for line in lines:
+            config_line = line.strip()
+            if not config_line:
+                continue
+            indent = line[: len(line) - len(line.lstrip())]
+            level = 0
+            while indent and level + 1 < len(stack):
+                level += 1
+                if stack[level] is None:
+                    break
+                if shift[level] is None:
+                    shift[level] = indent
+                indent = indent.replace(shift[level], "", 1)
+            parent = stack[level]
+            if parent is None:
+                # line from skipped section
+                continue
+            del stack[level + 1 :]
+            del shift[level + 1 :]
+            shift.append(None)
+            # if line should be skiped, or this is comment which is started from
+            # "skip_line", like "!some comment need to be skipped"
+            if config_line in skip_line or (not indent and config_line[0] in skip_line):
+                stack.append(None)
+            else:
+                stack.append(ConfigTree(config_line=config_line, parent=parent, priority=self.priority))
 
     def _assigne_template(self: ConfigTree, obj: ConfigTree) -> None:
         """
@@ -284,18 +1181,138 @@ class ConfigTree:
         "ip address {IP_ADDR} {MASK}", attr dict: {"IP_ADDR": "IP_ADDR", "MASK": "MASK"}\n
         result (replaced original leaf):\n
         "ip address {IP_ADDR} {MASK}", attr dict: {"IP_ADDR": "192.168.1.1", "MASK": "255.255.255.0"}\n
+        Every template line is assigned to the first matched line only. Template is not changed.
 
         Args:
-            obj (ConfigTree): Object with template (need to be tree).
+            obj (ConfigTree | Template): Object with template (need to be tree) or precompiled template.
         """
-        for self_child in self.child:
-            indx, match = self_child._exists_in(obj, bidir=True)
-            if match:
-                self_child.attr = obj.child[indx].attr.copy()
-                self_child._parse_attr(obj.child[indx]._format_config_line(mode="re"))
-                self_child.config_line = obj.child[indx].config_line
-                self_child._assigne_template(obj.child[indx])
-                obj.child.pop(indx)
+        template = obj if isinstance(obj, Template) else Template(obj)
+        template.assigne(self)
+
+    def update(self: ConfigTree, config_text: str, template: Template = None) -> UpdateResult:
+        """
+        Replace config with new text, reusing top level sections which are not changed.
+        New text is splitted to top level sections, section is reused (with assigned template)
+        if its text is the same as in previous update, section was not changed since that and
+        the same template line is assigned to the section header as if whole config is templated
+        again. Other sections are parsed and templated. Reused sections stay the same objects.
+        Config parsed in other way has no info about section text, so after the first update
+        sections are reused only if they are the same as parsed ones.
+
+        Args:
+            config_text (str): new config in text format
+            template (Template | ConfigTree, optional): template assigned to new config. Defaults to None.
+
+        Returns:
+            UpdateResult: (added, removed, changed) sections, changed - list of (old, new) pairs
+        """
+        if template is not None and not isinstance(template, Template):
+            template = Template(template)
+        has_template = template is not None and template.tree in template._sections
+        template_digest = template.digest if template is not None else None
+
+        # text of every top level section, lines before the first not indented one are parsed
+        # as separate section without reusing
+        chunks = [[]]
+        for line in self._preprocess_lines(config_text.split("\n")):
+            if line.strip() and not line[:1].isspace():
+                chunks.append([])
+            chunks[-1].append(line)
+
+        old_sections = {}
+        for section in self.child:
+            if section._source is not None and section._source[1] == section._content_hash():
+                old_sections.setdefault(section._source[0], []).append(section)
+
+        skip_line = self.skip_line
+        used = set()
+        result = []
+        created = []
+        for number, chunk in enumerate(chunks):
+            source = None
+            if number != 0:
+                config_line = chunk[0].strip()
+                if config_line in skip_line or config_line[0] in skip_line:
+                    # skipped section, see _build_tree_from_lines
+                    continue
+                indx = None
+                if has_template:
+                    header = ConfigTree(config_line=config_line, priority=self.priority)
+                    indx = template._find(template.tree, header, used)
+                digest = hashlib.blake2b("\n".join(chunk).encode("utf-8", "surrogatepass"), digest_size=16)
+                source = (digest.digest(), template_digest, indx, self.priority)
+                reused = old_sections.get(source)
+                if reused:
+                    result.append(reused.pop(0))
+                    if indx is not None:
+                        used.add(template.tree.child[indx])
+                    continue
+            new = ConfigTree(priority=self.priority)
+            new._build_tree_from_lines(chunk)
+            for section in new.child:
+                indx = template._find(template.tree, section, used) if has_template else None
+                if indx is not None:
+                    header = template.tree.child[indx]
+                    template._assigne_line(section, header)
+                    template._assigne(section, header, used)
+                    used.add(header)
+                if source is not None:
+                    section._source = (source, section._content_hash())
+                created.append((len(result), section))
+                result.append(section)
+
+        reused = set(result).difference(section for _, section in created)
+        removed = [section for section in self.child if section not in reused]
+        # new sections with the same header and content as removed ones are not changed,
+        # old objects are kept
+        removed_by_header = {}
+        for section in removed:
+            removed_by_header.setdefault(str(section), []).append(section)
+        added = []
+        changed = []
+        paired = set()
+        for position, section in created:
+            for old in removed_by_header.get(str(section), ()):
+                if old in paired:
+                    continue
+                paired.add(old)
+                if old._content() == section._content():
+                    old._source = section._source
+                    result[position] = old
+                else:
+                    changed.append((old, section))
+                break
+            else:
+                added.append(section)
+
+        self.child[:] = result
+        for section in result:
+            section.parent = self
+        removed = [section for section in removed if section not in paired]
+        for section in removed:
+            section.parent = None
+        for old, _ in changed:
+            old.parent = None
+        return UpdateResult(added, removed, changed)
+
+    def _content(self: ConfigTree) -> list:
+        """
+        State of all section nodes with their depth.
+
+        Returns:
+            list: list of (depth, config_line, attr, priority, action)
+        """
+        content = []
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            content.append((depth, node.config_line, tuple(node.attr.items()), node.priority, node.action))
+            stack.extend((child, depth + 1) for child in reversed(node.child))
+        return content
+
+    def _content_hash(self: ConfigTree) -> int:
+        # hash of section state, used to check that section is not changed
+        return hash(tuple(self._content()))
 
     def _parse_attr(self: ConfigTree, template: str) -> None:
         """
@@ -311,13 +1328,18 @@ class ConfigTree:
         Args:
             template (str): template sting in "re format" (check _format_config_line)
         """
-        re_attr = {}
-        for attr in self.attr.keys():
-            re_attr.setdefault(attr, r"\S+")
-        for attr in re_attr:
-            re_attr_copy = re_attr.copy()
-            re_attr_copy[attr] = r"(\S+)"
-            self.attr[attr] = re.findall(rf"^{template.format(**re_attr_copy)}", self.config_line)[0]
+        attr_parsed = self.attr.copy()
+        attr_names = tuple(attr_parsed)
+        for attr in attr_names:
+            key = ("attr", template, attr_names, attr)
+            pattern = self.pattern_cache.get(key)
+            if pattern is None:
+                re_attr = dict.fromkeys(attr_names, r"\S+")
+                re_attr[attr] = r"(\S+)"
+                pattern = self.pattern_cache.put(key, re.compile(rf"^{template.format(**re_attr)}"))
+            attr_parsed[attr] = pattern.findall(self.config_line)[0]
+        # new dict is assigned, so rendered line and lookup index of parent are updated
+        self.attr = attr_parsed
 
     def _get_attr(self: ConfigTree, config_line: str) -> dict:
         """
@@ -356,11 +1378,159 @@ class ConfigTree:
             tuple: (index,True) in case of success, (None,False) in case of no match.
             index - index in child list.
         """
-        for indx, obj_child in enumerate(obj.child):
-            result = obj_child.eq(self, param=param, templ=templ, bidir=bidir)
-            if result:
+        return obj._find_child(self, param, templ, bidir)
+
+    def _find_child(
+        self: ConfigTree,
+        obj: ConfigTree,
+        param: bool,
+        templ: bool,
+        bidir: bool,
+    ) -> tuple:
+        """
+        Find first child which is equal to obj, see _exists_in.
+        Plain childs are found with help of lookup index, only templated childs standing
+        before found one are compared with obj with regex.
+
+        Args:
+            obj (ConfigTree): object for which is tried to find match in self.child.
+            param (bool): consider or not parsed parameters.
+            templ (bool): compare with templates or not.
+            bidir (bool): compare in two way.
+
+        Returns:
+            tuple: (index,True) in case of success, (None,False) in case of no match.
+        """
+        child = self.child
+        line = str(obj)
+        signature = obj._signature() if bidir and templ else None
+        if not isinstance(child, _ChildList) or child._owner is not self or (bidir and templ and signature is None):
+            # child list is not tracked or obj is regex itself: check every child
+            for indx, self_child in enumerate(child):
+                if self_child.eq(obj, param=param, templ=templ, bidir=bidir):
+                    return indx, True
+            return None, False
+        index = self._index
+        if index is None:
+            index = self._index = _ChildIndex(child)
+        if not templ:
+            found = index.exact.get(line)
+        else:
+            line = obj._stripped()
+            found = index.match(line)
+            if bidir:
+                indx = index.match_masked(line, signature, child)
+                if indx is not None and (found is None or indx < found):
+                    found = indx
+        for indx in index.templated:
+            if found is not None and indx > found:
+                break
+            if child[indx].eq(obj, param=param, templ=templ, bidir=bidir):
                 return indx, True
-        return None, False
+        if found is None:
+            return None, False
+        return found, True
+
+    def _signature(self: ConfigTree) -> tuple:
+        """
+        Dots positions for plain line (without attributes and regex symbols except dots).
+
+        Returns:
+            tuple: dots positions or None if line is not plain
+        """
+        signature = self._plain_signature
+        if signature is not False:
+            return signature
+        line = self.config_line
+        if self.attr or not line or line != line.strip() or _RE_SPECIAL.search(line):
+            signature = None
+        else:
+            signature = []
+            pos = line.find(".")
+            while pos != -1:
+                signature.append(pos)
+                pos = line.find(".", pos + 1)
+            signature = tuple(signature)
+        self._plain_signature = signature
+        return signature
+
+    def _changed(self: ConfigTree) -> None:
+        """Drop rendered line, subtree hashes and lookup index of parent after config_line or attr change."""
+        self._str = None
+        self._str_stripped = None
+        self._plain_signature = False
+        self._drop_merkle()
+        if self.parent is not None:
+            self.parent._index = None
+
+    def _drop_merkle(self: ConfigTree) -> None:
+        """Drop subtree hashes of node and all its parents."""
+        node = self
+        # hashes of parent are calculated from child hashes, so parents of node without
+        # hashes have no hashes too
+        while node is not None and getattr(node, "_merkle", None) is not None:
+            node._merkle = None
+            node = node.parent
+
+    def _merkle_hashes(self: ConfigTree) -> tuple:
+        """
+        Subtree hashes, calculated on demand and cached until node or any of its childs
+        is changed. Line hash is made from rendered line and raw config_line (for lines
+        with attributes), subtree hash from line hash and hashes of childs.
+
+        Subtree is "simple" if all childs on all levels are plain lines (see _signature) and
+        no two sibling childs match each other. For simple subtrees eq(section=True) finds
+        for every child exactly the same child in other subtree, so equal hashes of simple
+        subtrees are enough to say that sections are equal.
+
+        Returns:
+            tuple: (order-sensitive hash, order-insensitive hash, sum of order-insensitive
+                hashes of childs, simple or not)
+        """
+        if self._merkle is not None:
+            return self._merkle
+        stack = [(self, False)]
+        while stack:
+            node, ready = stack.pop()
+            if not ready:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.child if child._merkle is None)
+                continue
+            ordered = []
+            unordered = 0
+            simple = True
+            # line length -> plain lines of childs
+            plain = {}
+            for child in node.child:
+                child_ordered, child_unordered, _, child_simple = child._merkle
+                ordered.append(child_ordered)
+                unordered += child_unordered
+                if simple:
+                    signature = child._signature()
+                    simple = child_simple and signature is not None
+                    if simple:
+                        plain.setdefault(len(child.config_line), []).append((child.config_line, signature))
+            if simple:
+                simple = _distinct_plain(plain)
+            line = (str(node), node.config_line if node.attr else None)
+            node._merkle = (hash((line, tuple(ordered))), hash((line, unordered)), unordered, simple)
+        return self._merkle
+
+    def subtree_hash(self: ConfigTree, ordered: bool = True) -> int:
+        """
+        Structural hash of node and all its childs, see _merkle_hashes.
+        Hash is cached and recalculated only after changes in subtree. Priority and action are
+        not used. Hash is based on builtin hash() of strings, so it can not be compared
+        between processes.
+
+        Args:
+            ordered (bool, optional): consider order of childs or not. Defaults to True.
+
+        Returns:
+            int: hash
+        """
+        merkle = self._merkle_hashes()
+        return merkle[0] if ordered else merkle[1]
 
     def _match_to_template(self: ConfigTree, obj: ConfigTree, param: bool) -> bool:
         """Match config_line obj to self with regex features.
@@ -378,23 +1548,30 @@ class ConfigTree:
             bool: equal or not
         """
 
-        attr = obj.attr.copy()
-        config_line = obj._format_config_line(mode="re")
-        for attr_name, attr_value in attr.items():
-            if not param or re.search(r"{{ \S+ }}", attr_value):
-                attr[attr_name] = r"\S+"
-        match = re.match(rf"^{config_line.format(**attr)}$", str(self).strip())
+        # parameter values which are used in pattern, None for "\S+"
+        attr_mask = tuple(
+            (attr_name, None if not param or _RE_ATTR.search(attr_value) else attr_value)
+            for attr_name, attr_value in obj.attr.items()
+        )
+        key = ("template", obj.config_line, attr_mask)
+        pattern = self.pattern_cache.get(key)
+        if pattern is None:
+            config_line = obj._format_config_line(mode="re")
+            attr = {attr_name: r"\S+" if attr_value is None else attr_value for attr_name, attr_value in attr_mask}
+            pattern = self.pattern_cache.put(key, re.compile(rf"^{config_line.format(**attr)}$"))
+        match = pattern.match(self._stripped())
         if match:
             return True
         else:
             return False
 
     def _copy_obj_attributes(self: ConfigTree, obj: ConfigTree) -> None:
+        # parent is not copied: node stays in its tree, so caches of its parents are dropped
+        # on later changes
         self.config_line = obj.config_line
-        self.parent = obj.parent
+        self.attr = obj.attr.copy()
         self.priority = obj.priority
         self.action = obj.action
-        self.attr = obj.attr.copy()
 
     def _copy(
         self: ConfigTree,
@@ -421,9 +1598,13 @@ class ConfigTree:
         #     priority=self.priority,
         # )
         # new_obj.attr = self.attr.copy()
-        new_obj = ConfigTree(parent=parent)
+        # new object is attached to parent after copying of attributes, so lookup index of
+        # parent is updated instead of dropping
+        new_obj = ConfigTree()
         new_obj._copy_obj_attributes(self)
         new_obj.parent = parent
+        if parent is not None:
+            parent.child.append(new_obj)
         if not with_child:
             return new_obj
         for child in self.child:
@@ -448,42 +1629,193 @@ class ConfigTree:
         Returns:
             str: text config
         """
-        if self.parent is None:
-            config_list = []
-        else:
-            if raw:
-                params = " |> " + str(self.attr) if len(self.attr) else ""
-                config_list = [self.action + symbol * _symbol_count + self.config_line + params]
-            else:
-                config_list = [self.action + symbol * _symbol_count + str(self)]
-        for child in self.child:
-            config_list.append(child.show_config(symbol=symbol, raw=raw, _symbol_count=_symbol_count + 1))
-        return "\n".join(config_list)
+        return "\n".join(self.iter_config(symbol=symbol, raw=raw, _symbol_count=_symbol_count))
 
-    def search(
+    def iter_config(
         self: ConfigTree,
-        string: str,
-        with_child: bool = True,
+        symbol: str = " ",
         raw: bool = False,
-    ) -> ConfigTree:
+        _symbol_count: int = -1,
+    ) -> Iterator[str]:
+        """
+        Config lines in text format, one by one without recursion.
+        Lines joined with "\n" are the same as show_config output.
+        Memory is O(depth) iterator frames, one iterator over childs for every level.
+
+        Args:
+            symbol (str, optional): padding symbol for sub-section. Defaults to " ".
+            raw (bool, optional): display with args (True) or values (False). Defaults to False.
+            symbol_count (int, optional): padding symbol count. Defaults to -1.
+
+        Yields:
+            Iterator[str]: config lines
+        """
+        node = self
+        symbol_count = _symbol_count
+        stack = []
+        while True:
+            if node.parent is not None:
+                if raw:
+                    params = " |> " + str(node.attr) if len(node.attr) else ""
+                    yield node.action + symbol * symbol_count + node.config_line + params
+                else:
+                    yield node.action + symbol * symbol_count + str(node)
+            elif node is not self and len(node.child) == 0:
+                # detached node without childs is displayed as empty line
+                yield ""
+            stack.append(iter(node.child))
+            symbol_count += 1
+            # the next node is the first child, or the next sibling of the node or of its parents
+            while stack:
+                node = next(stack[-1], None)
+                if node is not None:
+                    break
+                stack.pop()
+                symbol_count -= 1
+            else:
+                return
+
+    def write_config(
+        self: ConfigTree,
+        fp: TextIO,
+        symbol: str = " ",
+        raw: bool = False,
+    ) -> None:
+        """
+        Write config in text format to file object line by line, see show_config.
+
+        Args:
+            fp (TextIO): file object opened in text mode
+            symbol (str, optional): padding symbol for sub-section. Defaults to " ".
+            raw (bool, optional): display with args (True) or values (False). Defaults to False.
+        """
+        separator = ""
+        for line in self.iter_config(symbol=symbol, raw=raw):
+            fp.write(separator)
+            fp.write(line)
+            separator = "\n"
+
+    def search(
+        self: ConfigTree,
+        string: str | re.Pattern,
+        with_child: bool = True,
+        raw: bool = False,
+        limit: int = None,
+        first: bool = False,
+        depth: int = None,
+    ) -> ConfigTree:
         """
         Search text in config.
 
         Args:
-            string (str): String to search. Can be regex
+            string (str | re.Pattern): String to search. Can be regex or compiled pattern
             with_child (bool, optional): Deep search, in child objects also. Defaults to True.
             raw (bool, optional): Search in templated config (True) or compiled config (False). Defaults to False.
+            limit (int, optional): stop search after limit found objects. Defaults to None (no limit).
+            first (bool, optional): stop search after the first found object, the same as limit=1. Defaults to False.
+            depth (int, optional): max depth of searched objects, 1 - childs only. Defaults to None (no limit).
 
         Returns:
             ConfigTree: Tree object, can be used as original.
         """
+        if first:
+            limit = 1
         root = ConfigTree(priority=self.priority)
         filter_result = []
-        filter_result.extend(self._search(string, with_child, raw))
+        filter_result.extend(self._search(string, with_child, raw, limit=limit, depth=depth))
         for child in filter_result:
             root.merge(child)
         return root
 
+    def find(
+        self: ConfigTree,
+        string: str | re.Pattern,
+        with_child: bool = True,
+        raw: bool = False,
+        limit: int = None,
+        first: bool = False,
+        depth: int = None,
+    ) -> list:
+        """
+        Search text in config without copying, see search.
+        Nodes are visited in the same order and with the same rules as in search, found
+        nodes are returned as references, use materialize to get tree object.
+
+        Args:
+            string (str | re.Pattern): String to search. Can be regex or compiled pattern
+            with_child (bool, optional): Deep search, in child objects also. Defaults to True.
+            raw (bool, optional): Search in templated config (True) or compiled config (False). Defaults to False.
+            limit (int, optional): stop search after limit found objects. Defaults to None (no limit).
+            first (bool, optional): stop search after the first found object, the same as limit=1. Defaults to False.
+            depth (int, optional): max depth of searched objects, 1 - childs only. Defaults to None (no limit).
+
+        Returns:
+            list: list of NodeRef(node, path), path - tuple of node ancestors starting from root.
+        """
+        # string is compiled once per search, not for every line
+        pattern = string if isinstance(string, re.Pattern) else re.compile(string.strip())
+        if first:
+            limit = 1
+        path = []
+        node = self
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        path = tuple(reversed(path))
+        result = []
+        stack = [(child, path, 1) for child in reversed(self.child)]
+        while stack and (limit is None or len(result) < limit):
+            node, path, node_depth = stack.pop()
+            line = node.config_line.strip() if raw else node._stripped()
+            match = pattern.search(line)
+            if match:
+                result.append(NodeRef(node, path))
+            if len(node.child) != 0 and (not match or with_child) and (depth is None or node_depth < depth):
+                child_path = path + (node,)
+                stack.extend((child, child_path, node_depth + 1) for child in reversed(node.child))
+        return result
+
+    @classmethod
+    def materialize(cls, refs: Iterable[NodeRef], with_child: bool = True) -> ConfigTree:
+        """
+        Build tree object from search result, see find.
+        Every node is copied once, so found nodes with common ancestors share them in result.
+        Unlike search, found lines are not merged with each other by template/regex matching,
+        so result of both is the same for configs where such lines are different.
+
+        Args:
+            refs (Iterable[NodeRef]): found nodes in order returned by find
+            with_child (bool, optional): copy found nodes with their childs. Defaults to True.
+
+        Returns:
+            ConfigTree: Tree object, can be used as original.
+        """
+        root = None
+        # original node -> copy
+        copies = {}
+        # nodes copied with childs
+        full = set()
+        for node, path in refs:
+            if any(ancestor in full for ancestor in path):
+                continue
+            parent = None
+            for orig in path + (node,):
+                copy = copies.get(orig)
+                if copy is None:
+                    copy = copies[orig] = orig._copy(with_child=False, parent=parent)
+                    if parent is None:
+                        # the same as copy() of root: not linked to parent of original
+                        copy.parent = None
+                        root = copy
+                parent = copy
+            if with_child and node not in full:
+                full.add(node)
+                for child in node.child:
+                    child._copy(with_child=True, parent=parent)
+        if root is None:
+            root = cls()
+        return root
+
     def eq(
         self: ConfigTree,
         obj: ConfigTree,
@@ -525,6 +1857,11 @@ class ConfigTree:
         if section:
             if len(self.child) != len(obj.child):
                 return False
+            # equal simple sections are found by hashes in O(1), see _merkle_hashes
+            self_merkle = self._merkle_hashes()
+            obj_merkle = obj._merkle_hashes()
+            if self_merkle[3] and obj_merkle[3] and self_merkle[2] == obj_merkle[2]:
+                return obj.eq(self, param, templ, bidir)
             for obj_child in obj.child:
                 indx, match = obj_child._exists_in(self, param, templ, bidir)
                 if not match:
@@ -602,6 +1939,229 @@ class ConfigTree:
             root = root.parent
         return root
 
+    def to_bytes(self: ConfigTree) -> bytes:
+        """
+        Serialize tree (self is root) to compact binary format.
+        Nodes are stored in preorder as arrays: parent index, depth, config line, priority,
+        action and number of attributes, attribute names and values are stored in separate
+        arrays, all strings are stored once in string table. Priority can be int or float,
+        priorities which are not 64-bit integers are stored as strings in separate arrays.
+        Source of section (see update) is stored in separate arrays too if section is not
+        changed since update.
+
+        Raises:
+            ValueError: priority is not int or float
+
+        Returns:
+            bytes: serialized tree, see from_bytes
+        """
+        strings = {}
+        parents = array("i")
+        depths = array("I")
+        lines = array("I")
+        priorities = array("q")
+        actions = array("I")
+        attr_counts = array("I")
+        attr_names = array("I")
+        attr_values = array("I")
+        wide_nodes = array("I")
+        wide_priorities = array("I")
+        # source: node, text digest, template digest, template line index, priority
+        source_nodes = array("I")
+        source_digests = array("I")
+        source_templates = array("i")
+        source_lines = array("i")
+        source_priorities = array("I")
+        stack = [(self, -1, 0)]
+        while stack:
+            node, parent, depth = stack.pop()
+            indx = len(parents)
+            parents.append(parent)
+            depths.append(depth)
+            lines.append(strings.setdefault(node.config_line, len(strings)))
+            priority = node.priority
+            if type(priority) is int and -(1 << 63) <= priority < 1 << 63:
+                priorities.append(priority)
+            else:
+                priorities.append(0)
+                wide_nodes.append(indx)
+                wide_priorities.append(strings.setdefault(_priority_to_str(priority), len(strings)))
+            actions.append(strings.setdefault(node.action, len(strings)))
+            if node._source is not None and node._source[1] == node._content_hash():
+                # content hash is not the same in other process, it is calculated again on loading
+                digest, template_digest, template_line, priority = node._source[0]
+                source_nodes.append(indx)
+                source_digests.append(strings.setdefault(digest.hex(), len(strings)))
+                source_templates.append(
+                    -1 if template_digest is None else strings.setdefault(template_digest, len(strings)),
+                )
+                source_lines.append(-1 if template_line is None else template_line)
+                source_priorities.append(strings.setdefault(_priority_to_str(priority), len(strings)))
+            attr_counts.append(len(node.attr))
+            for attr_name, attr_value in node.attr.items():
+                attr_names.append(strings.setdefault(attr_name, len(strings)))
+                attr_values.append(strings.setdefault(attr_value, len(strings)))
+            stack.extend((child, indx, depth + 1) for child in reversed(node.child))
+        lengths = array("I", map(len, strings))
+        text = "".join(strings).encode("utf-8", "surrogatepass")
+        tables = (
+            parents,
+            depths,
+            lines,
+            priorities,
+            actions,
+            attr_counts,
+            attr_names,
+            attr_values,
+            wide_nodes,
+            wide_priorities,
+            source_nodes,
+            source_digests,
+            source_templates,
+            source_lines,
+            source_priorities,
+            lengths,
+        )
+        if sys.byteorder == "big":
+            for table in tables:
+                table.byteswap()
+        header = _BYTES_HEADER.pack(
+            _BYTES_MAGIC, len(parents), len(strings), len(attr_names), len(wide_nodes), len(source_nodes), len(text),
+        )
+        return b"".join((header, *(table.tobytes() for table in tables), text))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> ConfigTree:
+        """
+        Load tree serialized by to_bytes, trees saved in previous format (CTB1) are loaded too.
+
+        Args:
+            data (bytes): serialized tree
+
+        Raises:
+            ValueError: data is not serialized tree or is broken
+
+        Returns:
+            ConfigTree: root of the tree
+        """
+        data = memoryview(data)
+        try:
+            magic = bytes(data[:4])
+            if magic == _BYTES_MAGIC_V1:
+                # the same tables, there are no wide priorities and sources
+                _, nodes, strings, attrs, text_size = _BYTES_HEADER_V1.unpack_from(data)
+                wide, sources, offset = 0, 0, _BYTES_HEADER_V1.size
+            else:
+                _, nodes, strings, attrs, wide, sources, text_size = _BYTES_HEADER.unpack_from(data)
+                offset = _BYTES_HEADER.size
+        except struct.error:
+            raise ValueError("not a serialized ConfigTree") from None
+        if magic not in (_BYTES_MAGIC, _BYTES_MAGIC_V1):
+            raise ValueError("not a serialized ConfigTree")
+        tables = []
+        for typecode, count in (
+            ("i", nodes),
+            ("I", nodes),
+            ("I", nodes),
+            ("q", nodes),
+            ("I", nodes),
+            ("I", nodes),
+            ("I", attrs),
+            ("I", attrs),
+            ("I", wide),
+            ("I", wide),
+            ("I", sources),
+            ("I", sources),
+            ("i", sources),
+            ("i", sources),
+            ("I", sources),
+            ("I", strings),
+        ):
+            table = array(typecode)
+            size = table.itemsize * count
+            table.frombytes(data[offset : offset + size])
+            if len(table) != count:
+                raise ValueError("serialized ConfigTree is truncated")
+            if sys.byteorder == "big":
+                table.byteswap()
+            tables.append(table)
+            offset += size
+        (
+            parents,
+            depths,
+            lines,
+            priorities,
+            actions,
+            attr_counts,
+            attr_names,
+            attr_values,
+            wide_nodes,
+            wide_priorities,
+            source_nodes,
+            source_digests,
+            source_templates,
+            source_lines,
+            source_priorities,
+            lengths,
+        ) = tables
+        if len(data) != offset + text_size or nodes == 0:
+            raise ValueError("serialized ConfigTree is broken")
+        text = str(data[offset:], "utf-8", "surrogatepass")
+        table = []
+        start = 0
+        for length in lengths:
+            table.append(text[start : start + length])
+            start += length
+
+        result = []
+        attr_indx = 0
+        try:
+            for indx in range(nodes):
+                node = cls.__new__(cls)
+                parent = parents[indx]
+                if parent >= indx or (parent < 0) != (indx == 0):
+                    raise ValueError("serialized ConfigTree is broken")
+                if depths[indx] != (depths[parent] + 1 if parent >= 0 else 0):
+                    raise ValueError("serialized ConfigTree is broken")
+                node.parent = result[parent] if parent >= 0 else None
+                node.child = _ChildList(node)
+                node._index = None
+                node._config_line = table[lines[indx]]
+                node._str = None
+                node._str_stripped = None
+                node._plain_signature = False
+                node._merkle = None
+                node._source = None
+                attr_end = attr_indx + attr_counts[indx]
+                node._attr = _attr_dict(
+                    node,
+                    {table[attr_names[attr]]: table[attr_values[attr]] for attr in range(attr_indx, attr_end)},
+                )
+                attr_indx = attr_end
+                node.priority = priorities[indx]
+                node.action = table[actions[indx]]
+                if node.parent is not None:
+                    # index of new node is empty, no need to update it
+                    list.append(node.parent.child, node)
+                result.append(node)
+            for indx, priority in zip(wide_nodes, wide_priorities):
+                result[indx].priority = _priority_from_str(table[priority])
+            # content hash is calculated when the whole section is loaded
+            for indx, digest, template_digest, template_line, priority in zip(
+                source_nodes, source_digests, source_templates, source_lines, source_priorities,
+            ):
+                node = result[indx]
+                source = (
+                    bytes.fromhex(table[digest]),
+                    table[template_digest] if template_digest >= 0 else None,
+                    template_line if template_line >= 0 else None,
+                    _priority_from_str(table[priority]),
+                )
+                node._source = (source, node._content_hash())
+        except (IndexError, ValueError):
+            raise ValueError("serialized ConfigTree is broken") from None
+        return result[0]
+
     def merge(
         self: ConfigTree,
         obj: ConfigTree,
@@ -643,6 +2203,87 @@ class ConfigTree:
             else:
                 self.child[indx].merge(obj_child, param, templ, bidir)
 
+    def _merge_leaf(self: ConfigTree, obj: ConfigTree, param: bool, templ: bool, bidir: bool) -> None:
+        """
+        Merge attributes of bottom leaf obj to bottom leaf self, like to merge does.
+        obj is not changed, merge is done with its copy.
+
+        Args:
+            obj (ConfigTree): object to merge from.
+            param (bool): consider or not parsed parameters.
+            templ (bool): compare with templates or not.
+            bidir (bool): compare in two way.
+        """
+        if len(obj.child) != 0 or self.priority >= obj.priority:
+            return
+        if not self.attr and not obj.attr and self.config_line == obj.config_line:
+            # the same line without attributes: only priority and action are changed by merge
+            self.priority = obj.priority
+            self.action = obj.action
+            return
+        if not self.eq(obj, param, templ, bidir):
+            return
+        leaf = ConfigTree()
+        leaf._copy_obj_attributes(obj)
+        self.merge(leaf, param, templ, bidir)
+
+    @classmethod
+    def merge_all(
+        cls,
+        trees: Iterable[ConfigTree],
+        param: bool = False,
+        templ: bool = True,
+        bidir: bool = False,
+    ) -> ConfigTree:
+        """
+        Merge many trees at once.
+        Result is the same as merge of copies of trees one by one in priority order (from
+        lower priority to higher one), but every level is processed once for all trees:
+        childs of all trees are matched with the same lookup index of result node, and
+        matched sections are merged together on the next level. Trees are not changed, only
+        not matched sections are copied to result.
+
+        Args:
+            trees (Iterable[ConfigTree]): trees to merge, roots or sections.
+            param (bool, optional): consider or not parsed parameters. Defaults to False.
+            templ (bool, optional): compare with templates or not. Defaults to True.
+            bidir (bool, optional): compare in two way. like to obj1.eq(obj2) OR obj2.eq(obj1). Defaults to False.
+
+        Returns:
+            ConfigTree: merged tree
+        """
+        trees = sorted(trees, key=lambda tree: tree.priority)
+        if not trees:
+            return cls()
+        root = trees[0].copy()
+        members = [tree._walk_root() for tree in trees[1:]]
+        grown = len(root.child) != 0
+        for member in members:
+            if not grown:
+                root._merge_leaf(member, param, templ, bidir)
+            grown = grown or len(member.child) != 0
+        stack = [(root, members)]
+        while stack:
+            node, members = stack.pop()
+            # matched child -> list of objects to merge into it on the next level
+            groups = {}
+            # matched childs which are not bottom leafs anymore
+            grown = set()
+            for member in members:
+                for obj_child in member.child:
+                    indx, match = node._find_child(obj_child, param, templ, bidir)
+                    if not match:
+                        obj_child._copy(with_child=True, parent=node)
+                        continue
+                    child = node.child[indx]
+                    if len(child.child) == 0 and child not in grown:
+                        child._merge_leaf(obj_child, param, templ, bidir)
+                    if len(obj_child.child) != 0:
+                        grown.add(child)
+                    groups.setdefault(child, []).append(obj_child)
+            stack.extend(groups.items())
+        return root
+
     def replace(
         self: ConfigTree,
         obj: ConfigTree,
@@ -659,14 +2300,34 @@ class ConfigTree:
             templ (bool, optional): _description_. Defaults to True.
             bidir (bool, optional): _description_. Defaults to False.
         """
-        for obj_child in obj.child:
-            indx, match = obj_child._exists_in(self, param, templ, bidir)
-            if match:
-                self.child[indx].parent = None
-                self.child.pop(indx)
-                new_obj = obj_child._copy(with_child=True, parent=None)
-                new_obj.parent = self
-                self.child.insert(indx, new_obj)
+        # replaced childs are collected and changed at once, so lookup index is not rebuilt
+        # after every replace: position -> new child
+        replaced = {}
+        for obj_indx, obj_child in enumerate(obj.child):
+            indx = self._find_free_child(obj_child, replaced, param, templ, bidir)
+            if obj._find_child(obj_child, param, templ, bidir)[0] != obj_indx:
+                # obj_child is matched with previous childs of obj, so it can be matched with
+                # their copies which are already placed instead of original childs
+                for pos in sorted(replaced):
+                    if indx is not None and pos > indx:
+                        break
+                    if replaced[pos].eq(obj_child, param, templ, bidir):
+                        indx = pos
+                        break
+            if indx is None:
+                continue
+            new_obj = ConfigTree()
+            new_obj._copy_obj_attributes(obj_child)
+            for child in obj_child.child:
+                child._copy(with_child=True, parent=new_obj)
+            new_obj.parent = self
+            replaced[indx] = new_obj
+        if replaced:
+            child = list(self.child)
+            for indx, new_obj in replaced.items():
+                child[indx].parent = None
+                child[indx] = new_obj
+            self.child[:] = child
 
     def delete(
         self: ConfigTree,
@@ -675,45 +2336,268 @@ class ConfigTree:
         templ: bool = True,
         bidir: bool = False,
     ) -> None:
+        # deleted lines are found first and removed at once for every section, so lookup
+        # indexes are not rebuilt after every removed line
+        deleted = {}
+        matched = []
+        self._delete_walk(obj, deleted, param, templ, bidir, matched)
+        for obj_child in matched:
+            obj_child.parent = None
+        for node, indexes in deleted.items():
+            if indexes:
+                node.child[:] = [child for indx, child in enumerate(node.child) if indx not in indexes]
+
+    def _find_free_child(
+        self: ConfigTree,
+        obj: ConfigTree,
+        used: set,
+        param: bool,
+        templ: bool,
+        bidir: bool,
+    ) -> int:
+        """
+        Find first child which is equal to obj and is not used yet, see _find_child.
+        Used childs are the same as childs popped from the list by previous matches.
+
+        Args:
+            obj (ConfigTree): object to find.
+            used (set): indexes of used childs.
+            param (bool): consider or not parsed parameters.
+            templ (bool): compare with templates or not.
+            bidir (bool): compare in two way.
+
+        Returns:
+            int: index of child or None
+        """
+        indx, match = self._find_child(obj, param, templ, bidir)
+        if not match or indx not in used:
+            return indx
+        child = self.child
+        for indx in range(indx + 1, len(child)):
+            if indx not in used and child[indx].eq(obj, param=param, templ=templ, bidir=bidir):
+                return indx
+        return None
+
+    def _intersection_walk(self: ConfigTree, obj: ConfigTree, inter: ConfigTree, path: tuple) -> None:
+        """
+        Walk self and obj together and add matched lines of self to inter.
+        Matched childs are not popped from self, they are marked as used for current level, and
+        lines are added to inter in the same order as they were merged from list of copies.
+
+        Args:
+            obj (ConfigTree): object to intersect with.
+            inter (ConfigTree): root of result.
+            path (tuple): nodes of self from top level section to self.
+        """
+        used = set()
         for obj_child in obj.child:
-            indx, match = obj_child._exists_in(self, param, templ, bidir)
-            if match:
-                if len(obj_child.child) != 0:
-                    self.child[indx].delete(obj_child)
-                if len(self.child[indx].child) == 0 or (
-                    len(obj_child.child) == 0 and len(self.child[indx].child) != 0
-                ):
-                    self.child.pop(indx)
-                    obj_child.parent = None
-
-    def __intersection(self: ConfigTree, obj: ConfigTree) -> list:
-        result = []
+            indx = self._find_free_child(obj_child, used, param=True, templ=True, bidir=True)
+            if indx is None:
+                continue
+            child = self.child[indx]
+            if len(obj_child.child) != 0:
+                child._intersection_walk(obj_child, inter, path + (child,))
+            inter._add_path(path + (child,))
+            used.add(indx)
+
+    def _add_path(self: ConfigTree, path: tuple) -> None:
+        """
+        Add copy of path to tree, the same as merge(templ=False) of path copied up to root.
+
+        Args:
+            path (tuple): nodes from top level section to added one.
+        """
+        node = self
+        for depth, orig in enumerate(path):
+            indx, match = node._find_child(orig, param=False, templ=False, bidir=False)
+            if not match:
+                for orig in path[depth:]:
+                    node = orig._copy(with_child=False, parent=node)
+                return
+            node = node.child[indx]
+        if len(node.child) == 0 and node.priority < orig.priority:
+            # bottom leafs are merged with attributes of higher priority
+            leaf = ConfigTree()
+            leaf._copy_obj_attributes(orig)
+            node.merge(leaf, templ=False)
+
+    def _delete_walk(
+        self: ConfigTree,
+        obj: ConfigTree,
+        deleted: dict,
+        param: bool = True,
+        templ: bool = True,
+        bidir: bool = False,
+        matched: list = None,
+    ) -> None:
+        """
+        Walk self and obj together and mark lines of self which are deleted by delete(obj).
+        Nothing is changed in self, indexes of deleted childs are stored in deleted. As in
+        delete, param/templ/bidir are used for the top level only.
+
+        Args:
+            obj (ConfigTree): object with lines to delete.
+            deleted (dict): node -> set of indexes of deleted childs.
+            param (bool, optional): consider or not parsed parameters. Defaults to True.
+            templ (bool, optional): compare with templates or not. Defaults to True.
+            bidir (bool, optional): compare in two way. Defaults to False.
+            matched (list, optional): childs of obj which deleted lines are appended to. Defaults to None.
+        """
+        used = deleted.setdefault(self, set())
         for obj_child in obj.child:
-            indx, match = obj_child._exists_in(self, bidir=True)
-            if match:
-                if len(obj_child.child) != 0:
-                    result.extend(self.child[indx].__intersection(obj_child))
+            indx = self._find_free_child(obj_child, used, param, templ, bidir)
+            if indx is None:
+                continue
+            child = self.child[indx]
+            if len(obj_child.child) != 0:
+                child._delete_walk(obj_child, deleted, matched=matched)
+            if len(obj_child.child) == 0 or len(child.child) == len(deleted.get(child, ())):
+                used.add(indx)
+                if matched is not None:
+                    matched.append(obj_child)
+
+    def _copy_except(self: ConfigTree, deleted: dict, parent: ConfigTree) -> ConfigTree:
+        """
+        Copy object with childs except deleted ones.
 
-                result.append(self.child[indx].copy(with_child=False))
-                self.child.pop(indx)
+        Args:
+            deleted (dict): node -> set of indexes of deleted childs.
+            parent (ConfigTree): parent object for copy.
 
-        return result
+        Returns:
+            ConfigTree: copy of object
+        """
+        new_obj = self._copy(with_child=False, parent=parent)
+        used = deleted.get(self, ())
+        for indx, child in enumerate(self.child):
+            if indx not in used:
+                child._copy_except(deleted, new_obj)
+        return new_obj
 
-    def intersection(self: ConfigTree, obj: ConfigTree) -> ConfigTree:
-        inter = ConfigTree(priority=self.priority)
-        self_copy = self.copy()
-        inter_result = []
-        inter_result.extend(self_copy.__intersection(obj))
-        for child in inter_result:
-            # inter.attach(child)
-            inter.merge(child, templ=False)
+    def _copy_action(self: ConfigTree, parent: ConfigTree, action: str, priority: int = None) -> ConfigTree:
+        """
+        Copy object with childs, action (and priority if it is given) is set for all copied nodes.
+
+        Args:
+            parent (ConfigTree): parent object for copy.
+            action (str): action of copied nodes.
+            priority (int, optional): priority of copied nodes. Defaults to None (not changed).
+
+        Returns:
+            ConfigTree: copy of object
+        """
+        new_obj = self._copy(with_child=False, parent=parent)
+        new_obj.action = action
+        if priority is not None:
+            new_obj.priority = priority
+        for child in self.child:
+            child._copy_action(new_obj, action, priority)
+        return new_obj
+
+    def _copy_marked(self: ConfigTree, remove_obj: ConfigTree, parent: ConfigTree) -> ConfigTree:
+        """
+        Copy object with childs marked as mark_lines marks lines to remove: "-" for sections
+        which are found in remove_obj as is, " " for other lines. Action of object is not changed.
+
+        Args:
+            remove_obj (ConfigTree): lines to remove, the same level as object.
+            parent (ConfigTree): parent object for copy.
+
+        Returns:
+            ConfigTree: copy of object
+        """
+        new_obj = self._copy(with_child=False, parent=parent)
+        for child in self.child:
+            indx, match = child._exists_in(remove_obj)
+            if not match:
+                child._copy_action(new_obj, " ")
+            elif child.eq(remove_obj.child[indx], section=True):
+                child._copy_action(new_obj, "-")
+            else:
+                child._copy_marked(remove_obj.child[indx], new_obj).action = " "
+        return new_obj
+
+    def _merge_marked(self: ConfigTree, obj: ConfigTree, priority: int) -> None:
+        """
+        Merge lines to add as mark_lines does: the same as merge(param=True) of obj copy with
+        "+" action and given priority, but only lines which are added to self are copied.
+
+        Args:
+            obj (ConfigTree): lines to add, the same level as self.
+            priority (int): priority of added lines.
+        """
+        if len(self.child) == 0 and len(obj.child) == 0:
+            # bottom leafs, merge takes attributes of obj
+            leaf = ConfigTree()
+            leaf._copy_obj_attributes(obj)
+            leaf.action = "+"
+            leaf.priority = priority
+            self.merge(leaf, param=True)
+            return
+        for obj_child in obj.child:
+            indx, match = obj_child._exists_in(self, param=True)
+            if not match:
+                obj_child._copy_action(self, "+", priority)
+            else:
+                self.child[indx]._merge_marked(obj_child, priority)
+
+    def _walk_root(self: ConfigTree) -> ConfigTree:
+        """
+        Root for intersection and difference walks: tree itself for root, for section it is
+        copy of its parents (without other childs) with the section linked as child of copied
+        parent. Section itself is not changed, its parent is kept.
+
+        Returns:
+            ConfigTree: root
+        """
+        if self.parent is None:
+            return self
+        parent = self.parent._copy(with_child=False, parent=None)
+        parent.child.append(self)
+        while parent.parent is not None:
+            parent = parent.parent
+        return parent
+
+    def _intersection_from(self: ConfigTree, obj: ConfigTree, priority: int) -> ConfigTree:
+        # self is root
+        inter = ConfigTree(priority=priority)
+        self._intersection_walk(obj, inter, ())
         return inter
 
+    def _difference_from(self: ConfigTree, inter: ConfigTree) -> ConfigTree:
+        # self is root, inter is intersection of self with other tree
+        deleted = {}
+        self._delete_walk(inter, deleted)
+        return self._copy_except(deleted, None)
+
+    def intersection(self: ConfigTree, obj: ConfigTree) -> ConfigTree:
+        """
+        Lines of self which exist in obj.
+        Both trees are walked together, inputs are not changed and not copied, only lines of
+        result are created.
+
+        Args:
+            obj (ConfigTree): object to intersect with.
+
+        Returns:
+            ConfigTree: intersection
+        """
+        return self._walk_root()._intersection_from(obj, self.priority)
+
     def difference(self: ConfigTree, obj: ConfigTree) -> ConfigTree:
-        self_copy = self.copy()
-        inter = self_copy.intersection(obj)
-        self_copy.delete(inter)
-        return self_copy
+        """
+        Lines of self which do not exist in obj: self without intersection with obj.
+        Both trees are walked together, inputs are not changed and not copied, only lines of
+        result are created.
+
+        Args:
+            obj (ConfigTree): object to substract.
+
+        Returns:
+            ConfigTree: difference
+        """
+        source = self._walk_root()
+        return source._difference_from(source._intersection_from(obj, source.priority))
 
     def set_action(self: ConfigTree, action: str = "", section: bool = False) -> None:
         self.action = action
@@ -747,14 +2631,1160 @@ class ConfigTree:
         self.merge(add_obj_copy, param=True)
 
     def compliance(self: ConfigTree, obj: ConfigTree) -> tuple:
-        intersection = obj.intersection(self)
-        add_to_self = obj.difference(self)
-        remove_from_self = self.difference(obj)
-        full = self.copy()
-        full.mark_lines(remove_from_self, add_to_self)
+        """
+        Compare config with template (or other config).
+        Config and template are walked together: intersection of template with config is
+        calculated once and used for both intersection and lines to add, lines to remove
+        are calculated from intersection of config with template. Inputs are not changed
+        and not copied, only result trees are built. Full config is copied once with marks
+        of lines to remove, and only lines to add which are not in config are copied to it.
+
+        Args:
+            obj (ConfigTree): template.
+
+        Returns:
+            tuple: (intersection, lines to add, lines to remove, full config with marked lines)
+        """
+        if isinstance(obj, Template):
+            obj = obj.tree
+        tracer = self.tracer
+        start = time.perf_counter() if tracer.enabled else None
+        source = self._walk_root()
+        obj_source = obj._walk_root()
+        intersection = obj_source._intersection_from(self, obj.priority)
+        add_to_self = obj_source._difference_from(intersection)
+        remove_from_self = source._difference_from(source._intersection_from(obj, source.priority))
+        # the same as copy of self with mark_lines(remove_from_self, add_to_self)
+        full = source._copy_marked(remove_from_self, None)
+        full._merge_marked(add_to_self, self.priority + 1)
+        if start is not None:
+            tracer.record(
+                "compliance",
+                start,
+                time.perf_counter(),
+                nodes=_count_nodes(self),
+                template_nodes=_count_nodes(obj),
+                add=_count_nodes(add_to_self),
+                remove=_count_nodes(remove_from_self),
+            )
         return intersection, add_to_self, remove_from_self, full
 
 
+class Template:
+    """
+    Precompiled read-only template.
+    Template is parsed once and can be used by any number of ConfigTree objects (template
+    assignment and compliance) and worker processes: it is picklable and is not changed
+    during usage. For every template section are prepared:
+        - compiled pattern of every child line
+        - first word dispatch: childs with plain first word are grouped by this word,
+          other childs are checked for every line
+    """
+
+    __slots__ = ("tree", "digest", "_sections")
+
+    def __init__(self, tree: ConfigTree) -> None:
+        """
+        Precompile template.
+
+        Args:
+            tree (ConfigTree): template tree
+        """
+        self.tree = tree
+        self.digest = self._digest(tree)
+        # section node -> (child patterns, first word -> child indexes, other child indexes)
+        self._sections = {}
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if not node.child:
+                continue
+            patterns = []
+            dispatch = {}
+            other = []
+            for indx, child in enumerate(node.child):
+                patterns.append(self._compile(child))
+                token = _first_token(child.config_line)
+                if token is None:
+                    other.append(indx)
+                else:
+                    dispatch.setdefault(token, []).append(indx)
+            self._sections[node] = (patterns, dispatch, other)
+            # lookup index is used by compliance, so it is built once here
+            node._index = _ChildIndex(node.child)
+            stack.extend(node.child)
+
+    @classmethod
+    def from_file(cls, template_file: str) -> Template:
+        """
+        Read and precompile template from file.
+
+        Args:
+            template_file (str): file to read template from
+
+        Returns:
+            Template: precompiled template
+        """
+        with open(template_file, "r") as file_:
+            return cls(ConfigTree.from_stream(file_))
+
+    @classmethod
+    def from_text(cls, template_text: str) -> Template:
+        """
+        Precompile template from text.
+
+        Args:
+            template_text (str): template in text format
+
+        Returns:
+            Template: precompiled template
+        """
+        return cls(ConfigTree(config_text=template_text))
+
+    @staticmethod
+    def _digest(tree: ConfigTree) -> str:
+        """
+        Hash of template content, used as part of parse cache key.
+
+        Args:
+            tree (ConfigTree): template tree
+
+        Returns:
+            str: hex digest
+        """
+        digest = hashlib.sha256()
+        stack = [(tree, 0)]
+        while stack:
+            node, depth = stack.pop()
+            digest.update(repr((depth, node.config_line, sorted(node.attr.items()))).encode())
+            stack.extend((child, depth + 1) for child in reversed(node.child))
+        return digest.hexdigest()
+
+    def _compile(self: Template, node: ConfigTree) -> re.Pattern:
+        """
+        Compile pattern of template line, the same as _match_to_template with param=True.
+
+        Args:
+            node (ConfigTree): template line
+
+        Returns:
+            re.Pattern: compiled pattern or None if line is not valid regex
+        """
+        attr = {
+            attr_name: r"\S+" if _RE_ATTR.search(attr_value) else attr_value
+            for attr_name, attr_value in node.attr.items()
+        }
+        try:
+            return re.compile(rf"^{node._format_config_line(mode='re').format(**attr)}$")
+        except (re.error, KeyError, IndexError, ValueError):
+            # error is raised during comparison, as without precompilation
+            return None
+
+    def _eq(self: Template, node: ConfigTree, pattern: re.Pattern, obj: ConfigTree) -> bool:
+        """
+        The same as node.eq(obj, param=True, templ=True, bidir=True).
+
+        Args:
+            node (ConfigTree): template line
+            pattern (re.Pattern): compiled template line
+            obj (ConfigTree): config line
+
+        Returns:
+            bool: equal or not
+        """
+        if len(node.attr) != 0 and len(obj.attr) != 0 and node.config_line != obj.config_line:
+            return False
+        if str(node) == str(obj) or node._match_to_template(obj, True):
+            return True
+        if pattern is None:
+            return obj._match_to_template(node, True)
+        return bool(pattern.match(obj._stripped()))
+
+    def _find(self: Template, section: ConfigTree, obj: ConfigTree, used: set) -> int:
+        """
+        Find first not used template line which matches obj.
+
+        Args:
+            section (ConfigTree): template section
+            obj (ConfigTree): config line
+            used (set): template lines already assigned to config
+
+        Returns:
+            int: index in section child list or None
+        """
+        patterns, dispatch, other = self._sections[section]
+        token = _first_token(obj.config_line)
+        if token is None:
+            # line can be regex itself, so it is compared with every template line
+            candidates = range(len(section.child))
+        else:
+            candidates = heapq.merge(dispatch.get(token, ()), other)
+        for indx in candidates:
+            node = section.child[indx]
+            if node not in used and self._eq(node, patterns[indx], obj):
+                return indx
+        return None
+
+    def assigne(self: Template, config: ConfigTree) -> None:
+        """
+        Assigne template to config, see ConfigTree._assigne_template.
+
+        Args:
+            config (ConfigTree): config tree
+        """
+        tracer = config.tracer
+        start = time.perf_counter() if tracer.enabled else None
+        self._assigne(config, self.tree, set())
+        if start is not None:
+            tracer.record(
+                "template",
+                start,
+                time.perf_counter(),
+                nodes=_count_nodes(config),
+                template_nodes=_count_nodes(self.tree),
+            )
+
+    def _assigne(self: Template, config: ConfigTree, section: ConfigTree, used: set) -> None:
+        """
+        Assigne template section to childs of config node.
+
+        Args:
+            config (ConfigTree): config node
+            section (ConfigTree): template node
+            used (set): template lines already assigned to config
+        """
+        stack = [(config, section)]
+        while stack:
+            node, section = stack.pop()
+            if section not in self._sections:
+                continue
+            for child in node.child:
+                indx = self._find(section, child, used)
+                if indx is None:
+                    continue
+                template = section.child[indx]
+                self._assigne_line(child, template)
+                used.add(template)
+                stack.append((child, template))
+
+    @staticmethod
+    def _assigne_line(node: ConfigTree, template: ConfigTree) -> None:
+        """
+        Replace config line with template line and parse attribute values.
+
+        Args:
+            node (ConfigTree): config line
+            template (ConfigTree): matched template line
+        """
+        node.attr = template.attr.copy()
+        node._parse_attr(template._format_config_line(mode="re"))
+        node.config_line = template.config_line
+
+
+class ParseCache:
+    """
+    Content-addressed on-disk cache of parsed (and templated) trees.
+    Key is a hash of config text, template, parser version and settings, so changed
+    configs are parsed again and old entries are never read. Cache directory can be
+    shared by several processes: entries are written to temporary file and renamed,
+    entry removed by another process is a cache miss. Least recently used entries are
+    removed when total size of the cache exceeds max_size.
+    """
+
+    # format of cache entries, change it to ignore entries written by old code
+    FORMAT = "flat-1"
+    SUFFIX = ".tree"
+
+    def __init__(self, directory: str, max_size: int = 256 << 20) -> None:
+        """
+        Open cache directory.
+
+        Args:
+            directory (str): cache directory, created if not exists
+            max_size (int, optional): max size of cache in bytes. Defaults to 256 MiB.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # bytes written since last directory scan, the first put scans directory
+        self._written = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self: ParseCache, config: bytes, template: Template = None, priority: int = 100) -> str:
+        """
+        Cache key of config.
+
+        Args:
+            config (bytes): config file content
+            template (Template, optional): precompiled template. Defaults to None.
+            priority (int, optional): priority for merging. Defaults to 100.
+
+        Returns:
+            str: hex digest
+        """
+        key = (
+            __version__,
+            self.FORMAT,
+            tuple(ConfigTree.parser_config),
+            template.digest if template is not None else None,
+            priority,
+            len(config),
+        )
+        digest = hashlib.sha256()
+        digest.update(repr(key).encode())
+        digest.update(config)
+        return digest.hexdigest()
+
+    def _path(self: ParseCache, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self: ParseCache, key: str) -> ConfigTree:
+        """
+        Read tree from cache.
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            ConfigTree: tree or None if there is no such entry
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file_:
+                data = file_.read()
+            # access time for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            tree = ConfigTree.from_bytes(data)
+        except ValueError:
+            # broken entry, parsed again and overwritten
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tree
+
+    def put(self: ParseCache, key: str, tree: ConfigTree) -> None:
+        """
+        Write tree to cache.
+
+        Args:
+            key (str): cache key
+            tree (ConfigTree): tree to save
+        """
+        data = tree.to_bytes()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        replaced = False
+        try:
+            with os.fdopen(fd, "wb") as file_:
+                file_.write(data)
+            os.replace(tmp_path, self._path(key))
+            replaced = True
+        finally:
+            # temporary file is removed if writing is failed or interrupted
+            if not replaced:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        self._written += len(data)
+        # directory is scanned when enough data is written, not after every entry
+        if self._written >= self.max_size // 8:
+            self.evict()
+
+    def evict(self: ParseCache) -> None:
+        """
+        Remove least recently used entries, so cache size is not more than max_size.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(self.SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._written = 0
+
+    def clear(self: ParseCache) -> None:
+        """
+        Remove all entries.
+        """
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(self.SUFFIX):
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+    def load(self: ParseCache, config_file: str, template: Template = None, priority: int = 100) -> ConfigTree:
+        """
+        Read tree from cache or parse config file and save it to cache.
+
+        Args:
+            config_file (str): file to read config from
+            template (Template, optional): precompiled template. Defaults to None.
+            priority (int, optional): priority for merging. Defaults to 100.
+
+        Returns:
+            ConfigTree: root of the tree
+        """
+        with open(config_file, "rb") as file_:
+            data = file_.read()
+        key = self.key(data, template, priority)
+        tree = self.get(key)
+        if tree is None:
+            # parse the same content which is hashed, as open() in text mode does
+            tree = ConfigTree.from_stream(io.TextIOWrapper(io.BytesIO(data)), priority=priority, template=template)
+            self.put(key, tree)
+        return tree
+
+
+def _literal_runs(pattern: re.Pattern) -> list:
+    """
+    Literal parts of regex which are contained in every matched line.
+    Only parts outside of groups and not followed by optional quantifiers are taken, patterns
+    with alternatives, inline flags or case insensitive ones are not analyzed. Hex and octal
+    escapes are decoded, patterns with backreferences or named unicode symbols are not analyzed.
+
+    Args:
+        pattern (re.Pattern): compiled regex
+
+    Returns:
+        list: list of (text, at_start, at_end) or None if pattern can't be analyzed,
+            at_start/at_end - text is anchored to the start/end of line
+    """
+    text = pattern.pattern
+    if (
+        not isinstance(text, str)
+        or pattern.flags & (re.IGNORECASE | re.VERBOSE)
+        or "|" in text
+        or "(?" in text
+    ):
+        return None
+    runs = []
+    run = []
+    run_at_start = anchored = False
+    depth = 0
+    indx = 0
+
+    def flush(at_end: bool = False) -> None:
+        if run:
+            runs.append(("".join(run), run_at_start, at_end))
+            run.clear()
+
+    while indx < len(text):
+        char = text[indx]
+        indx += 1
+        if char == "\\":
+            if indx >= len(text):
+                return None
+            char = text[indx]
+            indx += 1
+            if char in "xuU":
+                # hex escape of one symbol
+                size = {"x": 2, "u": 4, "U": 8}[char]
+                digits = text[indx : indx + size]
+                if len(digits) != size or digits.strip(string.hexdigits) or int(digits, 16) > sys.maxunicode:
+                    return None
+                char = chr(int(digits, 16))
+                indx += size
+            elif char in "0123456789":
+                # octal escape: \0 with up to two octal digits or three octal digits,
+                # other digits are backreference
+                end = indx
+                while end < len(text) and end < indx + 2 and text[end] in string.octdigits:
+                    end += 1
+                if char != "0" and (char not in string.octdigits or end != indx + 2):
+                    return None
+                char = chr(int(char + text[indx:end], 8))
+                indx = end
+            elif char == "N":
+                # named unicode symbol
+                return None
+            elif char.isalnum():
+                # character class or special sequence
+                flush()
+                anchored = False
+                continue
+        elif char == "[":
+            end = indx + 1 if text[indx : indx + 1] == "^" else indx
+            end = text.find("]", end + 1)
+            while end != -1 and text[end - 1] == "\\":
+                end = text.find("]", end + 1)
+            if end == -1:
+                return None
+            indx = end + 1
+            flush()
+            anchored = False
+            continue
+        elif char in "()":
+            depth += 1 if char == "(" else -1
+            flush()
+            anchored = False
+            continue
+        elif char == "^":
+            flush()
+            anchored = indx == 1
+            continue
+        elif char == "$":
+            flush(at_end=indx == len(text))
+            anchored = False
+            continue
+        elif char in ".*?+":
+            flush()
+            anchored = False
+            continue
+        elif char == "{":
+            quantifier = _RE_QUANTIFIER.match(text, indx - 1)
+            if quantifier:
+                flush()
+                anchored = False
+                indx = quantifier.end()
+                continue
+        # literal symbol, optional if followed by quantifier
+        following = text[indx : indx + 1]
+        if following in ("*", "?") or (following == "{" and _RE_QUANTIFIER.match(text, indx)):
+            flush()
+            anchored = False
+            continue
+        if depth == 0:
+            if not run:
+                run_at_start = anchored
+            run.append(char)
+        anchored = False
+        if following == "+":
+            flush()
+    flush()
+    return runs
+
+
+class SearchIndex:
+    """
+    Inverted index for search over one or many trees.
+    Every node gets ID, index keeps token (word of config line) -> node IDs. Literal parts of
+    search regex are used to select candidate nodes, regex is checked for candidates only.
+    Search result is the same as ConfigTree.find/search for every indexed tree, if tree is
+    changed after indexing, it should be indexed again with update. Changed nodes which are
+    not indexed again are not found by their new lines.
+    """
+
+    MAGIC = b"CTI1"
+
+    def __init__(self, trees: dict = None, raw: bool = False) -> None:
+        """
+        Build index.
+
+        Args:
+            trees (dict, optional): key (ex: device name) -> tree. Defaults to None.
+            raw (bool, optional): index templated config (True) or compiled config (False). Defaults to False.
+        """
+        self.raw = raw
+        # key -> (tree, first ID, last ID + 1)
+        self._trees = {}
+        # ID -> node, None for removed nodes
+        self._nodes = []
+        # number of removed nodes, IDs are renumbered when they are more than a half
+        self._removed = 0
+        # ID -> parent ID, -1 for root
+        self._parents = array("i")
+        # token -> sorted node IDs
+        self._postings = {}
+        # key -> tokens of tree nodes at indexing time, they are removed from postings with tree
+        self._tree_tokens = {}
+        for key, tree in (trees or {}).items():
+            self.add(key, tree)
+
+    def __len__(self: SearchIndex) -> int:
+        return len(self._trees)
+
+    def __contains__(self: SearchIndex, key: str) -> bool:
+        return key in self._trees
+
+    def __getitem__(self: SearchIndex, key: str) -> ConfigTree:
+        return self._trees[key][0]
+
+    def _append(self: SearchIndex, key: str, tree: ConfigTree) -> None:
+        """
+        Give IDs to tree nodes in preorder (the same order as in ConfigTree.to_bytes).
+
+        Args:
+            key (str): tree key
+            tree (ConfigTree): root of the tree
+        """
+        first = len(self._nodes)
+        stack = [(tree, -1)]
+        while stack:
+            node, parent = stack.pop()
+            indx = len(self._nodes)
+            self._nodes.append(node)
+            self._parents.append(parent)
+            stack.extend((child, indx) for child in reversed(node.child))
+        self._trees[key] = (tree, first, len(self._nodes))
+
+    def _line(self: SearchIndex, node: ConfigTree) -> str:
+        # line which is matched with search regex, see ConfigTree.find
+        return node.config_line.strip() if self.raw else node._stripped()
+
+    def add(self: SearchIndex, key: str, tree: ConfigTree) -> None:
+        """
+        Add tree to index, tree with the same key is replaced.
+
+        Args:
+            key (str): tree key
+            tree (ConfigTree): root of the tree
+        """
+        if key in self._trees:
+            self.remove(key)
+        self._append(key, tree)
+        _, first, last = self._trees[key]
+        postings = self._postings
+        tree_tokens = set()
+        for indx in range(first, last):
+            # root line is not searched
+            if self._parents[indx] == -1:
+                continue
+            tokens = set(self._line(self._nodes[indx]).split(" "))
+            tree_tokens.update(tokens)
+            for token in tokens:
+                ids = postings.get(token)
+                if ids is None:
+                    ids = postings[token] = array("I")
+                ids.append(indx)
+        self._tree_tokens[key] = tree_tokens
+
+    def remove(self: SearchIndex, key: str) -> None:
+        """
+        Remove tree from index.
+
+        Args:
+            key (str): tree key
+        """
+        _, first, last = self._trees.pop(key)
+        # tokens are taken as they were indexed, nodes can be changed since that
+        tokens = self._tree_tokens.pop(key)
+        for indx in range(first, last):
+            self._nodes[indx] = None
+        for token in tokens:
+            ids = self._postings[token]
+            ids = array("I", (indx for indx in ids if not first <= indx < last))
+            if ids:
+                self._postings[token] = ids
+            else:
+                del self._postings[token]
+        self._removed += last - first
+        if self._removed * 2 > len(self._nodes):
+            self._compact()
+
+    def _compact(self: SearchIndex) -> None:
+        """
+        Renumber IDs without removed nodes. Trees have IDs in order of indexing, so order of IDs
+        is kept and postings stay sorted.
+        """
+        renumber = array("i", [-1]) * len(self._nodes)
+        nodes = []
+        parents = array("i")
+        for key, (tree, first, last) in self._trees.items():
+            new_first = len(nodes)
+            for indx in range(first, last):
+                renumber[indx] = len(nodes)
+                nodes.append(self._nodes[indx])
+                parent = self._parents[indx]
+                # parent is before its childs, it is renumbered already
+                parents.append(renumber[parent] if parent != -1 else -1)
+            self._trees[key] = (tree, new_first, len(nodes))
+        for token, ids in self._postings.items():
+            self._postings[token] = array("I", (renumber[indx] for indx in ids))
+        self._nodes = nodes
+        self._parents = parents
+        self._removed = 0
+
+    def update(self: SearchIndex, key: str, tree: ConfigTree = None) -> None:
+        """
+        Index tree again after change, tree can be changed in place or new tree object can be passed.
+
+        Args:
+            key (str): tree key
+            tree (ConfigTree, optional): new tree object. Defaults to None (the same tree).
+        """
+        if tree is None:
+            tree = self._trees[key][0]
+        self.add(key, tree)
+
+    def _tokens(self: SearchIndex, word: str, mode: str) -> list:
+        """
+        Indexed tokens which contain word.
+
+        Args:
+            word (str): part of token
+            mode (str): exact, prefix, suffix or inner (word is inside of token)
+
+        Returns:
+            list: tokens
+        """
+        if mode == "exact":
+            return [word] if word in self._postings else []
+        if mode == "prefix":
+            return [token for token in self._postings if token.startswith(word)]
+        if mode == "suffix":
+            return [token for token in self._postings if token.endswith(word)]
+        return [token for token in self._postings if word in token]
+
+    def _candidates(self: SearchIndex, pattern: re.Pattern) -> list:
+        """
+        Node IDs which can be matched by pattern, sorted.
+
+        Args:
+            pattern (re.Pattern): search regex
+
+        Returns:
+            list: node IDs
+        """
+        conditions = set()
+        for text, at_start, at_end in _literal_runs(pattern) or ():
+            words = text.split(" ")
+            if len(words) == 1:
+                if at_start and at_end:
+                    conditions.add((words[0], "exact"))
+                else:
+                    conditions.add((words[0], "prefix" if at_start else "suffix" if at_end else "inner"))
+                continue
+            conditions.add((words[0], "exact" if at_start else "suffix"))
+            conditions.update((word, "exact") for word in words[1:-1])
+            conditions.add((words[-1], "exact" if at_end else "prefix"))
+        # empty part of token does not limit anything
+        postings = []
+        for word, mode in conditions:
+            if word or mode == "exact":
+                tokens = self._tokens(word, mode)
+                postings.append((sum(len(self._postings[token]) for token in tokens), tokens))
+        if not postings:
+            return [indx for indx, node in enumerate(self._nodes) if node is not None and self._parents[indx] != -1]
+        # the most selective conditions first, conditions which select much more nodes than
+        # already selected are skipped, regex check of candidates is cheaper
+        postings.sort(key=lambda item: item[0])
+        result = None
+        for size, tokens in postings:
+            if result is not None and size > len(result) * 8:
+                break
+            ids = set()
+            for token in tokens:
+                ids.update(self._postings[token])
+            result = ids if result is None else result & ids
+            if not result:
+                return []
+        return sorted(result)
+
+    def _path(self: SearchIndex, indx: int) -> tuple:
+        # ancestors of the node starting from root
+        path = []
+        indx = self._parents[indx]
+        while indx != -1:
+            path.append(self._nodes[indx])
+            indx = self._parents[indx]
+        return tuple(reversed(path))
+
+    def find(
+        self: SearchIndex,
+        string: str | re.Pattern,
+        with_child: bool = True,
+        limit: int = None,
+        first: bool = False,
+    ) -> list:
+        """
+        Search text in all indexed trees without copying, see ConfigTree.find.
+
+        Args:
+            string (str | re.Pattern): String to search. Can be regex or compiled pattern
+            with_child (bool, optional): Deep search, in child objects also. Defaults to True.
+            limit (int, optional): stop search after limit found objects. Defaults to None (no limit).
+            first (bool, optional): stop search after the first found object, the same as limit=1. Defaults to False.
+
+        Returns:
+            list: list of (key, NodeRef), trees are in order of indexing
+        """
+        pattern = string if isinstance(string, re.Pattern) else re.compile(string.strip())
+        if first:
+            limit = 1
+        keys = {first_id: key for key, (_, first_id, _) in self._trees.items()}
+        starts = sorted(keys)
+        result = []
+        matched = set()
+        # parent ID -> path, the same for all childs
+        paths = {}
+        for indx in self._candidates(pattern):
+            if limit is not None and len(result) >= limit:
+                break
+            node = self._nodes[indx]
+            # node of removed tree
+            if node is None:
+                continue
+            if not pattern.search(node.config_line.strip() if self.raw else node._stripped()):
+                continue
+            if not with_child:
+                matched.add(indx)
+                # nodes inside of found section are not searched
+                parent = self._parents[indx]
+                while parent != -1 and parent not in matched:
+                    parent = self._parents[parent]
+                if parent != -1:
+                    continue
+            parent = self._parents[indx]
+            path = paths.get(parent)
+            if path is None:
+                path = paths[parent] = self._path(indx)
+            key = keys[starts[bisect.bisect_right(starts, indx) - 1]]
+            result.append((key, NodeRef(node, path)))
+        return result
+
+    def search(self: SearchIndex, string: str | re.Pattern, with_child: bool = True) -> dict:
+        """
+        Search text in all indexed trees, see ConfigTree.search.
+
+        Args:
+            string (str | re.Pattern): String to search. Can be regex or compiled pattern
+            with_child (bool, optional): Deep search, in child objects also. Defaults to True.
+
+        Returns:
+            dict: key -> tree object with found lines, only for trees with found lines
+        """
+        result = {}
+        for key, (node, _) in self.find(string, with_child=with_child):
+            root = result.get(key)
+            if root is None:
+                root = result[key] = ConfigTree(priority=self._trees[key][0].priority)
+            root.merge(node.copy(with_child=with_child))
+        return result
+
+    def save(self: SearchIndex, path: str) -> None:
+        """
+        Save index with trees to file, trees are serialized with ConfigTree.to_bytes.
+
+        Args:
+            path (str): file name
+        """
+        keys = list(self._trees)
+        tokens = list(self._postings)
+        # IDs are renumbered in order of trees, so removed nodes are not saved
+        renumber = {}
+        for key in keys:
+            _, first, last = self._trees[key]
+            for indx in range(first, last):
+                renumber[indx] = len(renumber)
+        counts = array("I", (len(self._postings[token]) for token in tokens))
+        ids = array("I", (renumber[indx] for token in tokens for indx in self._postings[token]))
+        tables = [array("I", map(len, keys)), array("I", map(len, tokens)), counts, ids]
+        if sys.byteorder == "big":
+            for table in tables:
+                table.byteswap()
+        blobs = [table.tobytes() for table in tables]
+        blobs.append("".join(keys).encode("utf-8", "surrogatepass"))
+        blobs.append("".join(tokens).encode("utf-8", "surrogatepass"))
+        blobs.extend(self._trees[key][0].to_bytes() for key in keys)
+        header = struct.pack(f"<4sBI{len(blobs)}Q", self.MAGIC, self.raw, len(blobs), *map(len, blobs))
+        with open(path, "wb") as file_:
+            file_.write(header)
+            for blob in blobs:
+                file_.write(blob)
+
+    @staticmethod
+    def _strings(lengths: bytes, text: bytes) -> list:
+        # strings saved as lengths and joined text
+        table = array("I")
+        table.frombytes(lengths)
+        if sys.byteorder == "big":
+            table.byteswap()
+        text = str(text, "utf-8", "surrogatepass")
+        result = []
+        start = 0
+        for length in table:
+            result.append(text[start : start + length])
+            start += length
+        if start != len(text):
+            raise ValueError("saved SearchIndex is broken")
+        return result
+
+    @classmethod
+    def load(cls, path: str) -> SearchIndex:
+        """
+        Load index with trees saved by save.
+
+        Args:
+            path (str): file name
+
+        Raises:
+            ValueError: file is not saved index or is broken
+
+        Returns:
+            SearchIndex: loaded index
+        """
+        with open(path, "rb") as file_:
+            data = memoryview(file_.read())
+        try:
+            magic, raw, blobs_count = struct.unpack_from("<4sBI", data)
+            if magic != cls.MAGIC or blobs_count < 6:
+                raise ValueError("not a saved SearchIndex")
+            sizes = struct.unpack_from(f"<{blobs_count}Q", data, struct.calcsize("<4sBI"))
+        except struct.error:
+            raise ValueError("not a saved SearchIndex") from None
+        offset = struct.calcsize(f"<4sBI{blobs_count}Q")
+        blobs = []
+        for size in sizes:
+            blobs.append(data[offset : offset + size])
+            offset += size
+        if offset != len(data):
+            raise ValueError("saved SearchIndex is broken")
+        key_lengths, token_lengths, counts, ids, keys, tokens, *trees = blobs
+        keys = cls._strings(key_lengths, keys)
+        tokens = cls._strings(token_lengths, tokens)
+        tables = []
+        for table in (counts, ids):
+            table, data = array("I"), table
+            table.frombytes(data)
+            if sys.byteorder == "big":
+                table.byteswap()
+            tables.append(table)
+        counts, ids = tables
+        if len(keys) != len(trees) or len(tokens) != len(counts) or sum(counts) != len(ids):
+            raise ValueError("saved SearchIndex is broken")
+        index = cls(raw=bool(raw))
+        for key, blob in zip(keys, trees):
+            index._append(key, ConfigTree.from_bytes(blob))
+        if ids and max(ids) >= len(index._nodes):
+            raise ValueError("saved SearchIndex is broken")
+        starts = [first for _, first, _ in index._trees.values()]
+        tree_keys = list(index._trees)
+        for key in tree_keys:
+            index._tree_tokens[key] = set()
+        start = 0
+        for token, count in zip(tokens, counts):
+            index._postings[token] = ids[start : start + count]
+            for key_indx in {bisect.bisect_right(starts, indx) - 1 for indx in index._postings[token]}:
+                index._tree_tokens[tree_keys[key_indx]].add(token)
+            start += count
+        return index
+
+
+# template, cache and tracer shared by all files parsed in worker process, see _init_worker
+_worker_template = None
+_worker_cache = None
+_worker_tracer = None
+
+
+def _init_worker(template: Template, cache: ParseCache, trace: bool = False) -> None:
+    """
+    Keep template and cache in worker process, so they are transferred once per worker, not per chunk.
+
+    Args:
+        template (Template): precompiled template or None
+        cache (ParseCache): parse cache or None
+        trace (bool, optional): record spans and send them to parent process. Defaults to False.
+    """
+    global _worker_template, _worker_cache, _worker_tracer
+    _worker_template = template
+    _worker_cache = cache
+    if trace:
+        _worker_tracer = ConfigTree.tracer = TraceRecorder()
+
+
+def _parse_chunk(paths: list, priority: int) -> tuple:
+    """
+    Parse group of files in worker process.
+
+    Args:
+        paths (list): config files
+        priority (int): priority for merging
+
+    Returns:
+        tuple: (list of ParseResult, list of spans), tree is serialized with ConfigTree.to_bytes
+    """
+    result = []
+    for path in paths:
+        if _worker_tracer is not None:
+            _worker_tracer.source = path
+        try:
+            if _worker_cache is not None:
+                tree = _worker_cache.load(path, template=_worker_template, priority=priority)
+            else:
+                tree = ConfigTree(config_file=path, template=_worker_template, priority=priority)
+        except Exception as exc:  # noqa: B902
+            # any error of one file (bad encoding, unexpected config structure) is reported for
+            # this file only, so it does not abort parsing of the whole batch
+            result.append(ParseResult(path, None, f"{type(exc).__name__}: {exc}"))
+        else:
+            # serialized tree is much faster to transfer than pickled object graph
+            result.append(ParseResult(path, tree.to_bytes(), None))
+    spans = []
+    if _worker_tracer is not None:
+        spans = _worker_tracer.spans
+        _worker_tracer.source = None
+        _worker_tracer.clear()
+    return result, spans
+
+
+def _chunks(paths: Iterable[str], chunk_size: int) -> list:
+    """
+    Split files to chunks, the largest files first.
+    Files larger than chunk_size are parsed one by one, smaller files are grouped together
+    up to chunk_size bytes.
+
+    Args:
+        paths (Iterable[str]): config files
+        chunk_size (int): chunk size in bytes
+
+    Returns:
+        list: list of file lists
+    """
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append((os.path.getsize(path), path))
+        except OSError:
+            # error will be reported by worker
+            sizes.append((0, path))
+    sizes.sort(key=lambda item: item[0], reverse=True)
+    chunks = []
+    chunk, chunk_bytes = [], 0
+    for size, path in sizes:
+        chunk.append(path)
+        chunk_bytes += size
+        if chunk_bytes >= chunk_size:
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _run_chunks(
+    chunks: deque,
+    workers: int,
+    in_flight: int,
+    initargs: tuple,
+    priority: int,
+    broken: list,
+) -> Iterator[tuple]:
+    """
+    Parse chunks in process pool until all of them are parsed or the pool is broken.
+    Pool is broken when worker process dies (ex: killed by OOM killer), then chunks which were
+    not finished are appended to broken, chunks which were not sent to workers stay in chunks.
+
+    Args:
+        chunks (deque): chunks of files, parsed chunks are taken from it
+        workers (int): number of worker processes
+        in_flight (int): max number of chunks sent to workers at once
+        initargs (tuple): arguments of _init_worker
+        priority (int): priority for merging
+        broken (list): chunks which were parsed when pool was broken
+
+    Yields:
+        Iterator[tuple]: (list of ParseResult, list of spans) of every parsed chunk
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+        # limited number of chunks in flight, so parsed trees are not accumulated in futures
+        running = {}
+        while not broken:
+            while chunks and len(running) < in_flight:
+                chunk = chunks.popleft()
+                try:
+                    running[executor.submit(_parse_chunk, chunk, priority)] = chunk
+                except BrokenProcessPool:
+                    broken.append(chunk)
+                    break
+            if not running or broken:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = running.pop(future)
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    broken.append(chunk)
+                except Exception as exc:  # noqa: B902
+                    # result can not be transferred (any pickling error), reported for files
+                    # of the chunk, other chunks are not affected
+                    yield [ParseResult(path, None, f"{type(exc).__name__}: {exc}") for path in chunk], []
+        # other running chunks fail with the same error, they are parsed again
+        broken.extend(running.values())
+
+
+def parse_many(
+    paths: Iterable[str],
+    template_file: str = None,
+    workers: int = None,
+    priority: int = 100,
+    chunk_size: int = 1 << 20,
+    template: Template = None,
+    cache_dir: str = None,
+) -> Iterator[ParseResult]:
+    """
+    Parse config files in process pool.
+    The largest files are scheduled first, small files are sent to workers in chunks to keep
+    IPC overhead low. Results are yielded as soon as chunk is parsed (order is not kept),
+    parsing error of one file does not abort the batch. Template is read and compiled once
+    and shared by all workers. If ConfigTree.tracer is enabled, workers record spans and
+    they are emitted to ConfigTree.tracer of the parent process.
+    If worker process dies, pool is started again. Files which were parsed at that moment are
+    parsed again one by one in single worker, so only the file which kills the worker is
+    reported as error.
+
+    Args:
+        paths (Iterable[str]): config files
+        template_file (str, optional): file to read template from. Defaults to None.
+        workers (int, optional): number of worker processes. Defaults to os.cpu_count().
+        priority (int, optional): priority for merging. Defaults to 100.
+        chunk_size (int, optional): max size of small files chunk in bytes. Defaults to 1 MiB.
+        template (Template, optional): precompiled template, used instead of template_file. Defaults to None.
+        cache_dir (str, optional): directory of parse cache, see ParseCache. Defaults to None (no cache).
+
+    Yields:
+        Iterator[ParseResult]: (path, tree, error), tree is None in case of error
+    """
+    workers = workers or os.cpu_count() or 1
+    if template is None and template_file is not None:
+        template = Template.from_file(template_file)
+    cache = ParseCache(cache_dir) if cache_dir is not None else None
+    tracer = ConfigTree.tracer
+    chunks = deque(_chunks(paths, chunk_size))
+    initargs = (template, cache, tracer.enabled)
+
+    def results(parsed: Iterator[tuple]) -> Iterator[ParseResult]:
+        for result, spans in parsed:
+            for span in spans:
+                tracer.emit(span)
+            for path, data, error in result:
+                yield ParseResult(path, ConfigTree.from_bytes(data) if error is None else None, error)
+
+    broken = []
+    while chunks:
+        yield from results(_run_chunks(chunks, workers, workers * 2, initargs, priority, broken))
+        # files of broken chunks are parsed one at a time, so the file of died worker is known
+        suspects = deque([path] for chunk in broken for path in chunk)
+        broken.clear()
+        while suspects:
+            yield from results(_run_chunks(suspects, 1, 1, initargs, priority, broken))
+            for (path,) in broken:
+                yield ParseResult(path, None, "BrokenProcessPool: worker process died while parsing the file")
+            broken.clear()
+
+
 # cfg1 = ConfigTree(
 #     config_file="cfg1.txt",
 #     # config_file="full.txt",
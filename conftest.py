@@ -0,0 +1 @@
+# repository root is added to sys.path by pytest, so tests import modules as they are
@@ -0,0 +1,53 @@
+import pickle
+
+from config_parser_v5 import ConfigTree, Template
+
+CONFIG = """ntp server 1.1.1.1
+interface Gi1
+ ip address 10.0.0.1 255.255.255.0"""
+TEMPLATE = """ntp server {{ NTP }}
+interface {{ INTERFACE }}
+ ip address {{ IP }} {{ MASK }}"""
+
+
+def test_attr_change_in_place() -> None:
+    config = ConfigTree(config_text=CONFIG, template=Template.from_text(TEMPLATE))
+    other = config.copy()
+    node = config.child[0]
+    hash_before = config.subtree_hash()
+    assert str(node) == "ntp server 1.1.1.1"
+    assert config.eq(other, section=True)
+
+    node.attr["NTP"] = "2.2.2.2"
+    assert str(node) == "ntp server 2.2.2.2"
+    assert "ntp server 2.2.2.2" in config.show_config()
+    assert config.subtree_hash() != hash_before
+    assert config.find("2.2.2.2")[0].node is node
+    # lookup index of parent is updated
+    assert ConfigTree(config_text="ntp server 2.2.2.2").child[0]._exists_in(config, templ=False)[1]
+
+    node.attr.update(NTP="1.1.1.1")
+    assert str(node) == "ntp server 1.1.1.1"
+    assert config.subtree_hash() == hash_before
+    assert config.eq(other, section=True)
+
+
+def test_attr_assignment_is_not_shared() -> None:
+    config = ConfigTree(config_text=CONFIG, template=Template.from_text(TEMPLATE))
+    node = config.child[1].child[0]
+    attr = {"IP": "10.0.0.2", "MASK": "255.255.255.0"}
+    node.attr = attr
+    assert str(node) == "ip address 10.0.0.2 255.255.255.0"
+    node.attr.pop("MASK")
+    assert attr == {"IP": "10.0.0.2", "MASK": "255.255.255.0"}
+
+
+def test_attr_pickle() -> None:
+    template = Template.from_text(TEMPLATE)
+    config = ConfigTree(config_text=CONFIG, template=template)
+    loaded = pickle.loads(pickle.dumps(config))
+    assert loaded.show_config(raw=True) == config.show_config(raw=True)
+    node = loaded.child[0]
+    node.attr["NTP"] = "3.3.3.3"
+    assert str(node) == "ntp server 3.3.3.3"
+    assert pickle.loads(pickle.dumps(template)).digest == template.digest
@@ -0,0 +1,115 @@
+import struct
+
+import pytest
+
+from config_parser_v5 import ConfigTree, Template
+
+CONFIG = """hostname r1
+interface Gi1
+ description uplink
+ ip address 10.0.0.1 255.255.255.0
+interface Gi2
+ shutdown
+router bgp 65000
+ neighbor 192.168.0.1 remote-as 65001"""
+TEMPLATE = """interface {{ INTERFACE }}
+ ip address {{ IP }} {{ MASK }}"""
+
+
+def nodes(tree: ConfigTree) -> list:
+    result = []
+    stack = [(tree, 0)]
+    while stack:
+        node, depth = stack.pop()
+        result.append((depth, node.config_line, dict(node.attr), node.priority, type(node.priority), node.action))
+        stack.extend((child, depth + 1) for child in reversed(node.child))
+    return result
+
+
+def test_round_trip() -> None:
+    config = ConfigTree(config_text=CONFIG, template=Template.from_text(TEMPLATE))
+    config.child[1].action = "delete"
+    loaded = ConfigTree.from_bytes(config.to_bytes())
+    assert nodes(loaded) == nodes(config)
+    assert loaded.show_config() == config.show_config()
+    assert loaded.subtree_hash() == config.subtree_hash()
+
+
+@pytest.mark.parametrize("priority", [1.5, -2.25, float("inf"), 1 << 64, -(1 << 63) - 1, 1 << 63, -(1 << 63)])
+def test_round_trip_priority(priority: int | float) -> None:
+    config = ConfigTree(config_text=CONFIG, priority=100)
+    config.child[1].priority = priority
+    config.child[1].child[0].priority = priority
+    loaded = ConfigTree.from_bytes(config.to_bytes())
+    assert nodes(loaded) == nodes(config)
+
+
+def test_unsupported_priority() -> None:
+    config = ConfigTree(config_text=CONFIG)
+    config.child[0].priority = "100"
+    with pytest.raises(ValueError):
+        config.to_bytes()
+
+
+def test_round_trip_keeps_update_sources() -> None:
+    template = Template.from_text(TEMPLATE)
+    config = ConfigTree()
+    config.update(CONFIG, template)
+    loaded = ConfigTree.from_bytes(config.to_bytes())
+    for section, other in zip(loaded.child, config.child):
+        assert section._source[0] == other._source[0]
+
+    result = loaded.update(CONFIG.replace("shutdown", "no shutdown"), template)
+    assert [(old.config_line, new.config_line) for old, new in result.changed] == [("interface Gi2", "interface Gi2")]
+    assert result.changed[0][0].child[0].config_line == "shutdown"
+    assert not result.added and not result.removed
+
+    # changed section has no source in serialized tree
+    loaded.child[0].config_line = "hostname r2"
+    assert ConfigTree.from_bytes(loaded.to_bytes()).child[0]._source is None
+
+
+def test_previous_format() -> None:
+    config = ConfigTree(config_text=CONFIG)
+    data = config.to_bytes()
+    _, _, strings, attrs, wide, sources, text_size = struct.unpack_from("<4sIIIIII", data)
+    assert wide == sources == 0
+    # the same tables, wide priorities and sources are empty
+    old = struct.pack("<4sIIII", b"CTB1", len(nodes(config)), strings, attrs, text_size) + data[28:]
+    loaded = ConfigTree.from_bytes(old)
+    assert nodes(loaded) == nodes(config)
+    assert all(node._source is None for node in loaded.child)
+
+
+@pytest.mark.parametrize("priority", [float("inf"), float("-inf"), float("nan"), 1 << 70])
+def test_round_trip_update_priority(priority: int | float) -> None:
+    config = ConfigTree(priority=priority)
+    config.update(CONFIG, Template.from_text(TEMPLATE))
+    loaded = ConfigTree.from_bytes(config.to_bytes())
+    assert [repr(section._source[0]) for section in loaded.child] == [
+        repr(section._source[0]) for section in config.child
+    ]
+    assert repr(nodes(loaded)) == repr(nodes(config))
+
+
+def test_broken_depth() -> None:
+    data = bytearray(ConfigTree(config_text=CONFIG).to_bytes())
+    count = len(nodes(ConfigTree(config_text=CONFIG)))
+    # depth of the second node
+    struct.pack_into("<I", data, 28 + 4 * count + 4, 5)
+    with pytest.raises(ValueError):
+        ConfigTree.from_bytes(bytes(data))
+
+
+@pytest.mark.parametrize("data", [b"", b"CTB2", b"XXXX" + bytes(20)])
+def test_not_serialized(data: bytes) -> None:
+    with pytest.raises(ValueError):
+        ConfigTree.from_bytes(data)
+
+
+def test_broken() -> None:
+    data = ConfigTree(config_text=CONFIG).to_bytes()
+    with pytest.raises(ValueError):
+        ConfigTree.from_bytes(data[:-5])
+    with pytest.raises(ValueError):
+        ConfigTree.from_bytes(data + b"x")
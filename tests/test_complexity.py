@@ -0,0 +1,26 @@
+import pytest
+
+from benchmarks.complexity import COUNT_LIMITS, check, count_lines, exponent, operations
+
+# counts of executed lines are the same in every run, so small configs are enough
+SIZE = 20
+STEPS = 4
+
+
+def test_exponent() -> None:
+    sizes = [10, 20, 40, 80]
+    assert exponent(sizes, [size * 1e-6 for size in sizes]) == pytest.approx(1)
+    assert exponent(sizes, [size**2 * 1e-6 for size in sizes]) == pytest.approx(2)
+    # one slow run does not decide the result
+    assert exponent(sizes, [10e-6, 40e-6, 40e-6, 80e-6]) < 1.35
+
+
+@pytest.fixture(scope="module")
+def results() -> dict:
+    return {result[0]: result[1:] for result in check(SIZE, 1, None, STEPS, count_lines, COUNT_LIMITS)}
+
+
+@pytest.mark.parametrize("name", list(operations(1)))
+def test_operation_growth(results: dict, name: str) -> None:
+    complexity, sizes, counts, growth, failed = results[name]
+    assert not failed, f"{name} grows as n^{growth:.2f}, more than declared {complexity}: {sizes} {counts}"
@@ -0,0 +1,49 @@
+import pytest
+
+from benchmarks.generator import generate_config
+from config_parser_v5 import ConfigTree
+
+LOW = """hostname r1
+interface Gi1
+ description uplink
+ shutdown
+router bgp 65000
+ neighbor 192.168.0.1 remote-as 65001"""
+HIGH = """hostname r2
+interface Gi1
+ description core
+ ip address 10.0.0.1 255.255.255.0
+interface Gi2
+ shutdown"""
+
+
+def merge_one_by_one(trees: list) -> ConfigTree:
+    trees = sorted(trees, key=lambda tree: tree.priority)
+    result = trees[0].copy()
+    for tree in trees[1:]:
+        result.merge(tree.copy())
+    return result
+
+
+def test_merge_all_is_merge_one_by_one() -> None:
+    low = ConfigTree(config_text=LOW, priority=100)
+    high = ConfigTree(config_text=HIGH, priority=101)
+    before = (low.show_config(), high.show_config())
+    # order of trees does not matter, priority does
+    result = ConfigTree.merge_all([high, low])
+    assert result.show_config() == merge_one_by_one([low, high]).show_config()
+    assert (low.show_config(), high.show_config()) == before
+    assert result is not low and result.child[0] is not low.child[0]
+
+
+@pytest.mark.parametrize("count", [1, 3, 5])
+def test_merge_all_generated(count: int) -> None:
+    trees = [ConfigTree(config_text=generate_config(20, seed=seed), priority=100 + seed) for seed in range(count)]
+    result = ConfigTree.merge_all(trees)
+    assert result.show_config(raw=True) == merge_one_by_one(trees).show_config(raw=True)
+
+
+def test_merge_all_empty() -> None:
+    result = ConfigTree.merge_all([])
+    assert isinstance(result, ConfigTree) and len(result.child) == 0
+    assert ConfigTree.merge_all([ConfigTree(), ConfigTree(config_text=LOW)]).show_config() == LOW
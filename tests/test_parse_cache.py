@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from config_parser_v5 import ConfigTree, ParseCache, Template
+
+CONFIG = """hostname r1
+interface Gi1
+ ip address 10.0.0.1 255.255.255.0"""
+TEMPLATE = """interface {{ INTERFACE }}
+ ip address {{ IP }} {{ MASK }}"""
+
+
+def write(path: str, text: str) -> str:
+    with open(path, "w") as file_:
+        file_.write(text)
+    return str(path)
+
+
+def test_load_hit_and_miss(tmp_path) -> None:
+    cache = ParseCache(str(tmp_path / "cache"))
+    config_file = write(tmp_path / "r1.cfg", CONFIG)
+    tree = cache.load(config_file)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.load(config_file).show_config() == tree.show_config() == CONFIG
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # changed file, template and priority are other keys
+    write(config_file, CONFIG.replace("r1", "r2"))
+    assert cache.load(config_file).child[0].config_line == "hostname r2"
+    template = Template.from_text(TEMPLATE)
+    templated = cache.load(config_file, template=template)
+    expected = ConfigTree(config_text=CONFIG.replace("r1", "r2"), template=template)
+    assert templated.show_config(raw=True) == expected.show_config(raw=True)
+    assert cache.load(config_file, priority=101).priority == 101
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_key(tmp_path) -> None:
+    cache = ParseCache(str(tmp_path))
+    assert cache.key(b"a") == cache.key(b"a")
+    assert cache.key(b"a") != cache.key(b"b")
+    assert cache.key(b"a") != cache.key(b"a", priority=101)
+    assert cache.key(b"a") != cache.key(b"a", Template.from_text(TEMPLATE))
+
+
+def test_broken_entry_is_miss(tmp_path) -> None:
+    cache = ParseCache(str(tmp_path))
+    key = cache.key(CONFIG.encode())
+    cache.put(key, ConfigTree(config_text=CONFIG))
+    assert cache.get(key).show_config() == CONFIG
+    write(cache._path(key), "broken")
+    assert cache.get(key) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict_and_clear(tmp_path) -> None:
+    cache = ParseCache(str(tmp_path), max_size=1)
+    first = cache.key(b"1")
+    second = cache.key(b"2")
+    cache.put(first, ConfigTree(config_text=CONFIG))
+    cache.put(second, ConfigTree(config_text=CONFIG))
+    # cache is evicted after every put, older entry is removed first
+    assert not os.path.exists(cache._path(first))
+    cache = ParseCache(str(tmp_path))
+    cache.put(first, ConfigTree(config_text=CONFIG))
+    write(tmp_path / "other.txt", "not cache entry")
+    cache.clear()
+    assert sorted(os.listdir(tmp_path)) == ["other.txt"]
+
+
+def test_put_removes_temporary_file(tmp_path, monkeypatch) -> None:
+    cache = ParseCache(str(tmp_path))
+
+    def interrupted(src: str, dst: str) -> None:
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(os, "replace", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        cache.put(cache.key(b"1"), ConfigTree(config_text=CONFIG))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+
+import pytest
+
+from config_parser_v5 import ConfigTree, parse_many
+
+
+def write_configs(tmp_path, count: int) -> list:
+    paths = []
+    for indx in range(count):
+        path = tmp_path / f"r{indx}.txt"
+        path.write_text(f"hostname R{indx}\ninterface Gi{indx}\n ip address 10.0.0.{indx} 255.255.255.0\n")
+        paths.append(str(path))
+    return paths
+
+
+def test_parse_many(tmp_path) -> None:
+    paths = write_configs(tmp_path, 5)
+    missing = str(tmp_path / "missing.txt")
+    results = {result.path: result for result in parse_many(paths + [missing], workers=2, chunk_size=64)}
+    assert sorted(results) == sorted(paths + [missing])
+    for path in paths:
+        assert results[path].error is None
+        assert results[path].tree.show_config() == ConfigTree(config_file=path).show_config()
+    assert results[missing].tree is None
+    assert results[missing].error.startswith("FileNotFoundError")
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="workers should inherit patched parser")
+def test_parse_many_worker_died(tmp_path, monkeypatch) -> None:
+    paths = write_configs(tmp_path, 12)
+    parse_lines = ConfigTree._parse_lines
+
+    def die_on_r3(self: ConfigTree, lines, source: str = None, encoding: str = None) -> None:
+        if source == paths[3]:
+            os._exit(1)
+        parse_lines(self, lines, source, encoding)
+
+    monkeypatch.setattr(ConfigTree, "_parse_lines", die_on_r3)
+    results = {result.path: result for result in parse_many(paths, workers=3, chunk_size=64)}
+    assert sorted(results) == sorted(paths)
+    assert results[paths[3]].tree is None
+    assert results[paths[3]].error.startswith("BrokenProcessPool")
+    assert all(results[path].error is None for path in paths if path != paths[3])
@@ -0,0 +1,91 @@
+import pytest
+
+from config_parser_v5 import ConfigTree, SearchIndex
+
+CONFIG = """interface Gi1
+ description uplink
+!
+ntp server 1.1.1.1"""
+
+
+def lines(result: list) -> list:
+    return [(key, str(ref.node)) for key, ref in result]
+
+
+def test_find_in_many_trees() -> None:
+    index = SearchIndex({"A": ConfigTree(config_text=CONFIG), "B": ConfigTree(config_text=CONFIG)})
+    assert lines(index.find("uplink")) == [("A", "description uplink"), ("B", "description uplink")]
+    assert lines(index.find("Gi1", with_child=False)) == [("A", "interface Gi1"), ("B", "interface Gi1")]
+    assert sorted(index.search("ntp")) == ["A", "B"]
+
+
+def test_update_after_edit_in_place() -> None:
+    first = ConfigTree(config_text=CONFIG)
+    index = SearchIndex({"A": first, "B": ConfigTree(config_text=CONFIG)})
+    first.child[0].config_line = "interface Gi2"
+    index.update("A")
+    assert lines(index.find("Gi1")) == [("B", "interface Gi1")]
+    assert lines(index.find("Gi2")) == [("A", "interface Gi2")]
+    index.update("A")
+    index.remove("B")
+    assert index.find("Gi1") == []
+    assert lines(index.find("Gi2")) == [("A", "interface Gi2")]
+
+
+def test_update_with_new_tree() -> None:
+    index = SearchIndex({"A": ConfigTree(config_text=CONFIG)})
+    index.update("A", ConfigTree(config_text="hostname R1"))
+    assert index.find("Gi1") == []
+    assert lines(index.find("hostname")) == [("A", "hostname R1")]
+
+
+def test_save_load(tmp_path) -> None:
+    first = ConfigTree(config_text=CONFIG)
+    index = SearchIndex({"A": first, "B": ConfigTree(config_text="hostname R1")})
+    path = str(tmp_path / "index")
+    index.save(path)
+    loaded = SearchIndex.load(path)
+    assert lines(loaded.find("Gi1|hostname")) == lines(index.find("Gi1|hostname"))
+    loaded["A"].child[0].config_line = "interface Gi2"
+    loaded.update("A")
+    assert lines(loaded.find("Gi")) == [("A", "interface Gi2")]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        r"interface \x47i1",
+        r"host\x6eame",
+        r"\101",
+        r"server \061.1",
+        r"Gi1",
+        r"\U00000047i1",
+        r"(\d)\.\1",
+        r"Gi\N{DIGIT ONE}",
+        r"\0",
+        r"desc\w+ uplink\b",
+    ],
+)
+def test_find_escaped(query: str) -> None:
+    trees = {"A": ConfigTree(config_text=CONFIG), "B": ConfigTree(config_text="hostname A\ninterface Gi1")}
+    index = SearchIndex(trees)
+    expected = [(key, str(ref.node)) for key, tree in trees.items() for ref in tree.find(query)]
+    assert lines(index.find(query)) == expected
+
+
+def test_removed_ids_are_compacted() -> None:
+    trees = {"A": ConfigTree(config_text=CONFIG), "B": ConfigTree(config_text="hostname R1\ninterface Gi1")}
+    index = SearchIndex(trees)
+    size = len(index._nodes)
+    for number in range(20):
+        trees["A"].child[0].config_line = f"interface Gi{number}"
+        index.update("A")
+        assert len(index._nodes) <= size * 2
+        # updated tree is the last one
+        expected = [(key, str(ref.node)) for key in ("B", "A") for ref in trees[key].find("interface")]
+        assert lines(index.find("interface")) == expected
+        assert lines(index.find("uplink")) == [("A", "description uplink")]
+        assert [str(node) for node in index.find("uplink")[0][1].path][1:] == [f"interface Gi{number}"]
+    index.remove("A")
+    assert len(index._nodes) == 3
+    assert lines(index.find("Gi1")) == [("B", "interface Gi1")]
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from config_parser_v5 import ConfigTree, Template, TraceRecorder, Tracer
+
+CONFIG = """Building configuration...
+hostname R1
+interface Gi1
+ ip address 10.0.0.1 255.255.255.0
+!
+end"""
+TEMPLATE = """hostname {{ HOSTNAME }}
+interface {{ INTERFACE }}
+ ip address {{ IP }} {{ MASK }}"""
+
+
+@pytest.fixture
+def recorder(monkeypatch) -> TraceRecorder:
+    recorder = TraceRecorder()
+    monkeypatch.setattr(ConfigTree, "tracer", recorder)
+    return recorder
+
+
+def test_default_tracer_is_disabled() -> None:
+    assert type(ConfigTree.tracer) is Tracer
+    assert not ConfigTree.tracer.enabled
+
+
+def test_phase_spans(tmp_path, recorder) -> None:
+    path = tmp_path / "r1.txt"
+    path.write_text(CONFIG)
+    template = Template.from_text(TEMPLATE)
+    config = ConfigTree(config_file=str(path), template=template)
+    config.compliance(template)
+    spans = {span.name: span for span in recorder.spans}
+    assert list(spans) == ["preprocess", "build", "template", "compliance"]
+    assert spans["preprocess"].fields == {
+        "source": str(path),
+        "input_lines": 6,
+        "input_size": len(CONFIG),
+        "lines": 5,
+    }
+    assert spans["build"].fields == {"source": str(path), "lines": 5, "nodes": 3}
+    assert spans["template"].fields == {"nodes": 3, "template_nodes": 3}
+    assert spans["compliance"].fields == {"nodes": 3, "template_nodes": 3, "add": 0, "remove": 0}
+    assert all(span.duration >= 0 for span in recorder.spans)
+
+
+def test_traced_parsing_streams_lines(recorder) -> None:
+    root = ConfigTree()
+
+    def lines():
+        for indx in range(100):
+            # previous lines are already attached, lines are not collected before building
+            assert len(root.child) == indx
+            yield f"hostname R{indx}"
+
+    root._parse_lines(lines())
+    assert len(root.child) == 100
+    assert [span.name for span in recorder.spans] == ["preprocess", "build"]
+
+
+def test_summary_and_save(tmp_path, recorder) -> None:
+    template = Template.from_text(TEMPLATE)
+    with recorder.file("r1"):
+        ConfigTree(config_text=CONFIG, template=template)
+    ConfigTree(config_text=CONFIG)
+    summary = recorder.summary()
+    assert sorted(summary) == ["<text>", "r1"]
+    assert summary["r1"]["build"]["nodes"] == 3
+    assert summary["r1"]["template"]["count"] == 1
+    assert "template" not in summary["<text>"]
+
+    recorder.save(str(tmp_path / "trace.json"))
+    data = json.loads((tmp_path / "trace.json").read_text())
+    assert data["files"] == json.loads(json.dumps(summary))
+    assert len(data["spans"]) == len(recorder.spans)
+    recorder.save(str(tmp_path / "chrome.json"), output_format="chrome")
+    events = json.loads((tmp_path / "chrome.json").read_text())["traceEvents"]
+    assert [event["name"] for event in events] == [span.name for span in recorder.spans]
+    assert all(event["ph"] == "X" for event in events)
+    with pytest.raises(ValueError):
+        recorder.save(str(tmp_path / "trace.xml"), output_format="xml")
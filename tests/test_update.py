@@ -0,0 +1,70 @@
+from config_parser_v5 import ConfigTree, Template, UpdateResult
+
+CONFIG = """hostname r1
+interface Gi1
+ description uplink
+ ip address 10.0.0.1 255.255.255.0
+interface Gi2
+ shutdown
+router bgp 65000
+ neighbor 192.168.0.1 remote-as 65001"""
+TEMPLATE = """interface {{ INTERFACE }}
+ ip address {{ IP }} {{ MASK }}"""
+
+
+def test_first_update_adds_all_sections() -> None:
+    config = ConfigTree()
+    result = config.update(CONFIG)
+    assert isinstance(result, UpdateResult)
+    assert [str(section) for section in result.added] == [
+        "hostname r1",
+        "interface Gi1",
+        "interface Gi2",
+        "router bgp 65000",
+    ]
+    assert result.removed == [] and result.changed == []
+    assert config.show_config() == ConfigTree(config_text=CONFIG).show_config()
+
+
+def test_update_reuses_sections() -> None:
+    config = ConfigTree()
+    config.update(CONFIG)
+    sections = list(config.child)
+    result = config.update(CONFIG.replace("shutdown", "no shutdown").replace("hostname r1\n", ""))
+    assert result.added == []
+    assert [str(section) for section in result.removed] == ["hostname r1"]
+    assert [(str(old), str(new)) for old, new in result.changed] == [("interface Gi2", "interface Gi2")]
+    old, new = result.changed[0]
+    assert old is sections[2] and old.parent is None
+    assert new.parent is config and str(new.child[0]) == "no shutdown"
+    assert config.child[0] is sections[1] and config.child[2] is sections[3]
+    assert sections[0].parent is None
+
+
+def test_update_after_change_in_place() -> None:
+    config = ConfigTree()
+    config.update(CONFIG)
+    section = config.child[1]
+    section.child[0].config_line = "description downlink"
+    result = config.update(CONFIG)
+    # the changed section is parsed again
+    assert [(old, str(new)) for old, new in result.changed] == [(section, "interface Gi1")]
+    assert "description uplink" in config.show_config()
+
+
+def test_update_with_template() -> None:
+    template = Template.from_text(TEMPLATE)
+    config = ConfigTree()
+    config.update(CONFIG, template)
+    templated = ConfigTree(config_text=CONFIG, template=template)
+    assert config.show_config(raw=True) == templated.show_config(raw=True)
+    sections = list(config.child)
+
+    result = config.update(CONFIG, template)
+    assert result == ([], [], [])
+    assert all(new is old for new, old in zip(config.child, sections))
+    # without template only templated section is changed
+    result = config.update(CONFIG)
+    assert [(old, str(new)) for old, new in result.changed] == [(sections[1], "interface Gi1")]
+    assert result.added == [] and result.removed == []
+    assert config.show_config(raw=True) == ConfigTree(config_text=CONFIG).show_config(raw=True)